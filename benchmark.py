@@ -0,0 +1,193 @@
+"""
+Benchmark and regression harness
+
+Runs every instance with several seeds, in parallel across instances, and reports
+for each instance the median and 90th percentile wall time, iterations per second,
+best and mean gap from the known optimum and the peak memory of the worker process.
+The results can be saved as JSON/CSV and compared with a baseline JSON file.
+
+Example:
+  python benchmark.py --seeds 5 --json results.json
+  python benchmark.py --seeds 5 --baseline results.json --max-time-regression 0.1
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import statistics
+import sys
+from multiprocessing import Pool
+import numpy as np
+from colonyModule import solver
+from colonyModule.dataset import load_dataset
+from example import DATASETS, OTHER_DATASETS
+
+FIELDS = ["dataset", "best", "runs", "failures", "median_time", "p90_time", "iterations_per_second",
+          "best_cost", "best_gap", "mean_gap", "peak_memory_mb"]
+
+
+def run_instance(instance, seeds, parameters, options):
+    """
+    Solve an instance once for each seed and summarize the runs
+    """
+    dataset = load_dataset(instance["file"])
+    times, costs, iterations, failures = [], [], 0, 0
+
+    for seed in seeds:
+        solution = solver.solve(dataset, parameters, seed=seed, **options)
+
+        if solution["cost"] is None:
+            failures += 1
+            continue
+
+        times.append(solution["time"])
+        costs.append(solution["cost"])
+        iterations += solution["iterations"]
+
+    gaps = [(cost / instance["best"] - 1) * 100 for cost in costs]
+
+    return {"dataset": dataset.name,
+            "best": instance["best"],
+            "runs": len(seeds),
+            "failures": failures,
+            "median_time": statistics.median(times) if times else None,
+            "p90_time": float(np.percentile(times, 90)) if times else None,
+            "iterations_per_second": iterations / sum(times) if times else None,
+            "best_cost": min(costs) if costs else None,
+            "best_gap": min(gaps) if gaps else None,
+            "mean_gap": statistics.mean(gaps) if gaps else None,
+            # high-water mark of the worker process, which runs only this instance, in MiB on Linux
+            "peak_memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def run_benchmark(instances, seeds, parameters=None, options=None, jobs=None):
+    """
+    Benchmark the instances in parallel, one process for each instance at a time
+    An instance that can't be loaded or solved is reported with its error and doesn't stop the others
+    """
+    # the ants of an instance run in its own process, the parallelism is across instances
+    options = dict({"backend": "serial"}, **(options or {}))
+    results = []
+
+    # a fresh process for each instance, so the peak memory is the one of the instance
+    with Pool(jobs, maxtasksperchild=1) as pool:
+        futures = [pool.apply_async(run_instance, (instance, seeds, parameters, options)) for instance in instances]
+
+        for instance, future in zip(instances, futures):
+            try:
+                results.append(future.get())
+            except Exception as e:
+                results.append({"dataset": os.path.basename(instance["file"]), "best": instance["best"],
+                                "error": repr(e)})
+
+    return results
+
+
+def compare(results, baseline, max_time_regression, max_gap_regression):
+    """
+    List the regressions of results against baseline
+
+    max_time_regression is the relative increase allowed for the median time,
+    max_gap_regression the increase allowed for the mean gap, in percentage points
+    """
+    baseline = {result["dataset"]: result for result in baseline}
+    regressions = []
+
+    for result in results:
+        old = baseline.get(result["dataset"])
+
+        if old is None or old.get("median_time") is None:
+            continue
+
+        if result.get("median_time") is None:
+            regressions.append(result["dataset"] + ": no solution, " + result.get("error", "all the runs failed"))
+            continue
+
+        if result["median_time"] > old["median_time"] * (1 + max_time_regression):
+            regressions.append("%s: median time %.3fs, baseline %.3fs" % (result["dataset"], result["median_time"], old["median_time"]))
+
+        if result["mean_gap"] > old["mean_gap"] + max_gap_regression:
+            regressions.append("%s: mean gap %.2f%%, baseline %.2f%%" % (result["dataset"], result["mean_gap"], old["mean_gap"]))
+
+    return regressions
+
+
+def write_csv(results, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, FIELDS + ["error"], extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def print_results(results):
+    print("%-22s %8s %8s %9s %10s %8s %8s %9s" % ("dataset", "median", "p90", "it/s", "best", "gap", "mean gap", "peak MiB"))
+
+    for result in results:
+        if "error" in result or result["median_time"] is None:
+            print("%-22s %s" % (result["dataset"], result.get("error", "no solution")))
+            continue
+
+        print("%-22s %8.3f %8.3f %9.1f %10.1f %8.2f %8.2f %9.1f" % (
+            result["dataset"], result["median_time"], result["p90_time"], result["iterations_per_second"],
+            result["best_cost"], result["best_gap"], result["mean_gap"], result["peak_memory_mb"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--instances", help="JSON list of {\"file\": ..., \"best\": ...}, by default the datasets of example.py found on disk")
+    parser.add_argument("--seeds", type=int, default=3, help="number of seeded runs for each instance")
+    parser.add_argument("--jobs", type=int, help="instances solved at the same time, by default one for each cpu")
+    parser.add_argument("--iterations", type=int, help="iterations of each run, by default the README ones")
+    parser.add_argument("--colony-size", type=int, help="ants of each colony, by default the README ones")
+    parser.add_argument("--stagnation", type=int, help="stop a run after this number of iterations without improvement")
+    parser.add_argument("--time-limit", type=float, help="seconds allowed to each run")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--csv", help="write the results to this CSV file")
+    parser.add_argument("--baseline", help="JSON results to compare with, exits with 1 on regressions")
+    parser.add_argument("--max-time-regression", type=float, default=0.1, help="relative increase of the median time allowed")
+    parser.add_argument("--max-gap-regression", type=float, default=0.5, help="increase of the mean gap allowed, in percentage points")
+    args = parser.parse_args(argv)
+
+    if args.instances:
+        with open(args.instances) as f:
+            instances = json.load(f)
+    else:
+        instances = [instance for instance in DATASETS + OTHER_DATASETS if os.path.exists(instance["file"])]
+
+    parameters = {}
+    if args.iterations:
+        parameters["iterations"] = args.iterations
+    if args.colony_size:
+        parameters["colony_size"] = args.colony_size
+
+    options = {}
+    if args.stagnation:
+        options["stagnation"] = args.stagnation
+    if args.time_limit:
+        options["time_limit"] = args.time_limit
+
+    results = run_benchmark(instances, list(range(args.seeds)), parameters, options, jobs=args.jobs)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.csv:
+        write_csv(results, args.csv)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_time_regression, args.max_gap_regression)
+
+        for regression in regressions:
+            print("regression: " + regression)
+
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
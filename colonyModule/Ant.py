@@ -1,75 +1,75 @@
-from heapq import nlargest
-import random
-import itertools
-from multiprocessing import Process, Queue
-from colonyModule import utils
+import numpy as np
+from colonyModule import localsearch, utils
 
 
-class Ant(Process):
+class Ant:
     """
     Creates an Ant
 
-    Each ant visits all the nodes
+    Each ant visits all the nodes, nodes are identified by their index in the matrices
 
     Parameters:
-      current_node: current node where the ant is
-      unvisited_nodes: a list of nodes that the ant can visit
+      nest: the node where the ant starts and returns to
+      nodes_size: number of nodes
       pheromone_matrix: value of pheromone between nodes
       distance_matrix: the distance matrix of the nodes
-      cost_function: a function to calculate the cost of a path
+      heuristic_matrix: static part (eta * mi) of the probability between nodes
+      neighbor_lists: nearest nodes of each node, used to prune the 2-opt moves (None to try all of them)
+      candidate_lists: nearest nodes of each node, the only ones scored while building the route
+                       unless none of them can be visited (None to score all the unvisited nodes)
+      subroute_cache: subroutes.SubrouteCache with the optimized subroutes of the colony (None to optimize all of them)
       max_load: max load for each ant
-      demand: vertices demand
-      alpha, beta, gamma, lam: algorithm parameters
-      Q: queue to merge output data from processes
+      demand: array of the vertices demand
+      alpha, lam: algorithm parameters, beta and gamma are already in heuristic_matrix
+      rng: numpy random generator of the ant
 
-      route: the route path of the ant
+      current_node: current node where the ant is
+      unvisited: flags of the nodes that the ant can visit
+      route: the route path of the ant, preallocated for the worst case
       cost: cost of the route
       load: how much load has the ant
     """
 
-    def __init__(self, current_node, unvisited_nodes, pheromone_matrix, distance_matrix, cost_function, max_load, demand, alpha, beta, gamma, lam, Q):
-        super(Ant, self).__init__()
-        self._current_node = current_node
-        self._unvisited_nodes = unvisited_nodes[:]
+    def __init__(self, nest, nodes_size, pheromone_matrix, distance_matrix, heuristic_matrix, neighbor_lists, candidate_lists, subroute_cache, max_load, demand, alpha, lam, rng):
+        self._nest = nest
         self._pheromone_matrix = pheromone_matrix
         self._distance_matrix = distance_matrix
-        self._cost_function = cost_function
+        self._heuristic_matrix = heuristic_matrix
+        self._neighbor_lists = neighbor_lists
+        self._candidate_lists = candidate_lists
+        self._subroute_cache = subroute_cache
         self._max_load = max_load
         self._demand = demand
         self._alpha = alpha
-        self._beta = beta
-        self._gamma = gamma
         self._lam = lam
-        self._Q = Q
-
-        self._route = []
+        self._rng = rng
+
+        self._current_node = nest
+        self._unvisited = np.ones(nodes_size, dtype=bool)
+        self._unvisited_count = nodes_size
+        # a route visits the nest at most once after each other node
+        self._route = np.empty(2 * nodes_size, dtype=np.intp)
+        self._route_length = 0
         self._routes = None
         self._cost = 0.0
         self._load = 0
 
         # add nest to route
-        self._add_node_to_route(self._current_node)
-
-    def reset_ant(self, current_node, unvisited_nodes, pheromone_matrix):
-        """
-        Reset an ant for a next pass
-        """
-        self.__init__(self._current_node, unvisited_nodes, pheromone_matrix, self._distance_matrix, self._cost_function,
-                      self._max_load, self._demand, self._alpha, self._beta, self._gamma, self._lam, self._Q)
-        self._routes = None
+        self._add_node_to_route(self._nest)
 
     def run(self):
         """
         Start the journey of an ant
         It returns to the nest when full until all the nodes are visited
+        and returns the split route and its cost
         """
-        count_nodes = len(self._unvisited_nodes)
+        count_nodes = self._unvisited_count
 
-        while self._unvisited_nodes:
+        while self._unvisited_count:
             to_node = self._find_best_route()
 
             # if the ant is in the nest and the next node is a deficit node, starts with a load that allows to satisfy the demand of to_node
-            if(self._demand[to_node.id] < 0 and self._current_node == self._route[0]):
+            if(self._demand[to_node] < 0 and self._current_node == self._nest):
                 self._load = self._max_load
 
             # if count_nodes is less than zero we can't find a solution
@@ -78,9 +78,9 @@ class Ant(Process):
                 return {"route": None,
                         "cost": None}
 
-            if (self._load + self._demand[to_node.id] > self._max_load or self._load + self._demand[to_node.id] < 0):
+            if (self._load + self._demand[to_node] > self._max_load or self._load + self._demand[to_node] < 0):
                 # returns to the deposit since the ant is full or it hasn't enough food
-                if(self._current_node != self._route[0]):
+                if(self._current_node != self._nest):
                     self._return_to_nest()
 
                 # checks if there isn't any solution
@@ -90,7 +90,7 @@ class Ant(Process):
             # if the cost of the the trip from the current node to the to_node is greater
             # than the trip from the current node and the nest plus the trip from the nest
             # to the to_node, then return to the nest
-            if (self._cost_function(self._current_node, to_node) > self._cost_function(self._current_node, self._route[0]) + self._cost_function(self._route[0], to_node)):
+            if (self._distance_matrix[self._current_node, to_node] > self._distance_matrix[self._current_node, self._nest] + self._distance_matrix[self._nest, to_node]):
                 self._return_to_nest()
                 continue
 
@@ -98,25 +98,21 @@ class Ant(Process):
 
         # if we finished the unvisited nodes we should return to the deposit,
         # but only if we are not in the deposit
-        if self._route[-1] is not self._route[0]:
+        if self._current_node != self._nest:
             self._return_to_nest()
 
-        self._routes = utils.split_route(self._route)
+        self._routes = utils.split_route(self._route[:self._route_length], self._nest)
 
         self._cost = self._route_optimization()
 
-        self._Q.put({"route": self._routes,
-                     "cost": self._cost})
-
-        # return {"route": self._route,
-        #        "cost": self._cost}
+        return {"route": self._routes,
+                "cost": self._cost}
 
     def _return_to_nest(self):
         """
         Return the ant to the nest
         """
-        self._unvisited_nodes.extend([self._route[0]])
-        self._step_route(self._current_node, self._route[0])
+        self._step_route(self._current_node, self._nest)
         self._load = 0
 
     def _step_route(self, from_node, to_node):
@@ -125,53 +121,98 @@ class Ant(Process):
         """
         self._add_node_to_route(to_node)
         self._update_cost(from_node, to_node)
-        self._load += self._demand[to_node.id]
+        self._load += self._demand[to_node]
         self._current_node = to_node
 
     def _add_node_to_route(self, node):
         """
           Add new node to route and remove it from unvisited nodes
         """
-        self._route.extend([node])
-        self._unvisited_nodes.remove(node)
+        self._route[self._route_length] = node
+        self._route_length += 1
+
+        if self._unvisited[node]:
+            self._unvisited[node] = False
+            self._unvisited_count -= 1
 
     def _update_cost(self, from_node, to_node):
         """
           Update cost to reach a new node
         """
-        self._cost += self._cost_function(from_node, to_node)
+        self._cost += self._distance_matrix[from_node, to_node]
 
     def _find_best_route(self):
         """
           Find the best route according to the probability of each node
         """
-        probability_list = dict()
+        nodes = None
+
+        if self._candidate_lists is not None:
+            nodes = self._feasible_candidates()
 
-        for node in self._unvisited_nodes:
-            probability = self._calculate_probability(node)
-            probability_list[node] = probability
+        if nodes is None or not len(nodes):
+            nodes = np.flatnonzero(self._unvisited)
 
-        # select at random between the 3 nodes with max probability
-        to_node = random.choice(
-            list(nlargest(2, probability_list, key=probability_list.__getitem__)))
+        probability_list = self._calculate_probabilities(nodes)
+
+        # select at random between the 2 nodes with max probability
+        best_nodes = np.argsort(-probability_list, kind="stable")[:2]
+        to_node = int(nodes[best_nodes[self._rng.integers(len(best_nodes))]])
 
         return to_node
 
-        # return min(probability_list, key=probability_list.__getitem__)
+    def _feasible_candidates(self):
+        """
+          Return the unvisited candidates of the current node that the ant can serve with its load
+        """
+        candidates = self._candidate_lists[self._current_node]
+        candidates = candidates[self._unvisited[candidates]]
+        demand = self._demand[candidates]
+
+        if self._current_node == self._nest:
+            # the ant leaves the nest full when it goes to a deficit node
+            return candidates[np.abs(demand) <= self._max_load]
+
+        load = self._load + demand
+
+        return candidates[(load >= 0) & (load <= self._max_load)]
 
     def _route_optimization(self):
         """
         Call of methods to further optimize the route
         """
-        cost = 0.0
+        if self._subroute_cache is not None:
+            cost, _, _ = self._cached_optimization()
+            return cost
 
         self._inverse_optimization()
         self._two_opt()
 
-        for route in self._routes:
-            cost += utils.calculate_route_cost(self._cost_function, route)
+        return localsearch.solution_cost(self._routes, self._distance_matrix)
 
-        return cost
+    def _cached_optimization(self):
+        """
+        Optimize only the subroutes that aren't in the subroute cache and reuse the others
+        It returns the cost of the route and the number of cache hits and misses
+        """
+        entries = [self._subroute_cache.get(route) for route in self._routes]
+        missed = [i for i, entry in enumerate(entries) if entry is None]
+
+        if missed:
+            routes = self._routes
+            self._routes = [routes[i] for i in missed]
+
+            self._inverse_optimization()
+            self._two_opt()
+
+            for i, route in zip(missed, self._routes):
+                cost = localsearch.solution_cost([route], self._distance_matrix)
+                self._subroute_cache.put(routes[i], route, cost)
+                entries[i] = (route, cost)
+
+        self._routes = [list(ordering) for ordering, _ in entries]
+
+        return float(sum(cost for _, cost in entries)), len(entries) - len(missed), len(missed)
 
     def _inverse_optimization(self):
         """
@@ -179,68 +220,40 @@ class Ant(Process):
         """
 
         for i, route in enumerate(self._routes):
-            inverted_route = list(reversed(route))
+            inverted_route = route[::-1]
 
             check = utils.check_demand(inverted_route, self._demand, self._max_load)
 
             # consider only route with valid demand and which are not composed by a cycle of only one non-nest node
             if check and len(inverted_route) > 3:
-                route_cost = utils.calculate_route_cost(self._cost_function, route)
-                inverted_route_cost = utils.calculate_route_cost(
-                    self._cost_function, inverted_route)
+                route_cost = localsearch.solution_cost([route], self._distance_matrix)
+                inverted_route_cost = localsearch.solution_cost([inverted_route], self._distance_matrix)
 
                 if (inverted_route_cost < route_cost):
                     self._routes[i] = inverted_route
 
-    def remove_depot(self, route):
-        route = [node for node in route if node.id != 0]
-        return route
-
-    def opt_swap(self, route, i, k):
-        route_to_i = route[:i]
-        route_to_k = list(reversed(route[i:k]))
-        route_to_end = route[k:]
-
-        return route_to_i + route_to_k + route_to_end
-
     def _two_opt(self):
-        new_route_cost = 0.0
-        new_best_route = []
+        """
+        Improve each subroute with 2-opt moves until it reaches a local optimum
+        It returns the number of moves tried and applied
+        """
+        total_tried = total_applied = 0
 
         for k, route in enumerate(self._routes):
-            new_route = self.remove_depot(route)
-            current_cost = utils.calculate_route_cost(self._cost_function, route)
-            old_route_cost = current_cost
+            new_route, tried, applied = localsearch.two_opt(route, self._distance_matrix, self._demand,
+                                                            self._max_load, self._neighbor_lists)
+            total_tried += tried
+            total_applied += applied
 
-            for i in range(len(new_route)):
-                for j in range(i+1, len(new_route)):
-                    new_route = self.opt_swap(new_route, i, j)
+            if applied:
+                self._routes[k] = new_route
 
-                    if utils.check_demand(new_route, self._demand, self._max_load):
-                        new_route_cost = utils.calculate_route_cost(self._cost_function, new_route)
+        return total_tried, total_applied
 
-                        new_route_cost += self._distance_matrix[route[0].id][new_route[0].id] + \
-                            self._distance_matrix[new_route[len(
-                                new_route)-1].id][route[0].id]
-
-                        if new_route_cost < current_cost:
-                            current_cost = new_route_cost
-                            new_best_route = new_route
-
-            if old_route_cost > current_cost:
-                new_best_route.insert(0, route[0])
-                new_best_route.append(route[0])
-                self._routes[k] = new_best_route
-
-    def _calculate_probability(self, node):
+    def _calculate_probabilities(self, nodes):
         """
-        Calculate probability of a route
+        Calculate probability of a route for every node in nodes
         """
 
-        numerator = utils.calculate_numerator(self._pheromone_matrix, self._distance_matrix, self._current_node,
-                                        node, self._load, self._max_load, self._demand, self._alpha, self._beta, self._gamma, self._lam)
-        denominator = utils.calculate_denominator(self._unvisited_nodes, self._pheromone_matrix, self._distance_matrix, self._current_node,
-                                            node, self._load, self._max_load, self._demand, self._alpha, self._beta, self._gamma, self._lam)
-        probability = utils.calculate_probability(numerator, denominator)
-
-        return probability
+        return utils.calculate_probabilities(self._pheromone_matrix, self._heuristic_matrix, self._current_node, nodes,
+                                             self._load, self._max_load, self._demand, self._alpha, self._lam)
@@ -1,14 +1,20 @@
+import queue
+import time
+from contextlib import closing, nullcontext
 import numpy as np
-from multiprocessing import Process, Queue
-from colonyModule.Ant import Ant
+from colonyModule import backends, heuristics, localsearch, state, subroutes, utils, worker
+from colonyModule.stats import Stats
 
 
 class Colony:
     """
       Defines a colony of ants
 
+      The colony works on node ids (the index of a node in the matrices), nodes and
+      cost_function are used only to return the best solution
+
       Attributes:
-        nodes: dict of nodes (key: (value1, value2))
+        nodes: list of nodes
         demand: vertices demand
         nest: initial node
         max_load: max load for each ant
@@ -17,16 +23,38 @@ class Colony:
         beta: distant influence coefficient
         rho: pheromone evaporation coefficient
         sigma: pheromone deposit coefficient
-        iterations: stopping condition
-        cost_function: a function to calculate the cost of a path
-        pheromone_matrix: value of pheromone between nodes
+        iterations: stopping condition, max number of iterations
+        cost_function: a function to calculate the cost of a path, used to price the returned solution (None to use distance_matrix)
+        pheromone_matrix: value of pheromone between nodes, None to start from a uniform pheromone
         distance_matrix: value of distance between nodes
+        heuristic_cache: cache of the heuristic matrices, shared by all the colonies by default
+        neighbors: number of nearest nodes tried by the 2-opt moves of each node, None to try all the nodes
+        candidates: number of nearest nodes scored by the ants at each step, falling back to all the unvisited
+                    nodes when none of them can be served; None to always score all the unvisited nodes
+        subroute_cache: max number of optimized subroutes kept for the ants to reuse, None to optimize
+                        every subroute; with the processes backend each worker keeps its own cache
+        inter_route: improve the best solution of each iteration moving nodes between its subroutes
+        backend: where the ants search food, "serial", "threads", "processes" or "auto" to choose by instance size
+        workers: number of threads or processes of the backend, by default one for each cpu
+        seed: seed of the random streams of the ants, runs with the same seed give the same result
+        instrument: record phase timers and counters of the colony and of the ants in stats
+        stagnation: stop after this number of iterations without improving the best solution
+        time_limit: stop before an iteration that would end after this number of seconds, the length of the
+                    next iteration is estimated from the last one so the first iteration always runs
+        target_cost: stop when the best solution costs at most this
+        max_evaluations: evaluate at most this number of ants, the last iteration sends only the ants left
+        asynchronous: don't wait for all the ants of an iteration, each slot of the backend sends its ants
+                      again as soon as they are done and the pheromone is updated after each batch,
+                      scaled by its share of the colony; the run is bounded by the ants evaluated
+                      (iterations * colony_size or max_evaluations) instead of the iterations
+        initial_solution: a solution of node ids of a previous run (for example from state.load_state),
+                          its subroutes still feasible with the current demand are reinforced
+                          and, if all of them are, it's the starting best solution
 
         nodes_size: number of nodes
-        ants_list: list of the ants in the colony
     """
 
-    def __init__(self, nodes, demand, nest, max_load, colony_size, alpha, beta, gamma, lam, rho, sigma, iterations, cost_function, pheromone_matrix, distance_matrix):
+    def __init__(self, nodes, demand, nest, max_load, colony_size, alpha, beta, gamma, lam, rho, sigma, iterations, cost_function, pheromone_matrix, distance_matrix, heuristic_cache=None, neighbors=10, candidates=None, subroute_cache=None, inter_route=True, backend="auto", workers=None, seed=None, instrument=False, stagnation=None, time_limit=None, target_cost=None, max_evaluations=None, asynchronous=False, initial_solution=None):
         self._nodes = nodes
         self._demand = demand
         self._nest = nest
@@ -42,11 +70,35 @@ class Colony:
         self._cost_function = cost_function
         self._pheromone_matrix = pheromone_matrix
         self._distance_matrix = distance_matrix
+        self._demand_array = np.asarray(demand)
+        self._inter_route = inter_route
+
+        if heuristic_cache is None:
+            heuristic_cache = heuristics.default_cache
+
+        # eta * mi depends only on the instance, so it's computed once and shared by all the ants
+        self._heuristic_matrix = heuristic_cache.get(self._distance_matrix, self._beta, self._gamma)
+        self._neighbor_lists = None if neighbors is None else heuristic_cache.neighbors(self._distance_matrix, neighbors)
+        self._candidate_lists = None if candidates is None else heuristic_cache.neighbors(self._distance_matrix, candidates)
+
+        self._subroute_cache = None if subroute_cache is None else subroutes.SubrouteCache(subroute_cache)
 
-        self._Q = Queue()
         self._nodes_size = len(nodes)
+        self._node_lookup = {node.id: node for node in nodes}
+        self._off_diagonal = ~np.eye(self._nodes_size, dtype=bool)
+        self._backend_name = backend
+        self._workers = workers
+        self._backend = None
+        self._entropy = np.random.SeedSequence(seed).entropy
+        self._instrument = instrument
+        self._stats = None
+        self._stagnation = stagnation
+        self._time_limit = time_limit
+        self._target_cost = target_cost
+        self._max_evaluations = max_evaluations
+        self._asynchronous = asynchronous
 
-        if (self._pheromone_matrix == None):
+        if self._pheromone_matrix is None:
             #self._pheromone_matrix = np.random.rand(self._nodes_size, self._nodes_size)
             #self._pheromone_matrix = np.full((self._nodes_size, self._nodes_size), (1/(self._nodes_size ** 2)))
             self._pheromone_matrix = np.full(
@@ -54,80 +106,428 @@ class Colony:
 
             # reset the main diagonal since there can't be pheromone traces going to a node itself
             np.fill_diagonal(self._pheromone_matrix, 0)
+        else:
+            # the colony updates its pheromone in place
+            self._pheromone_matrix = np.array(self._pheromone_matrix, dtype=float)
+
+            if self._pheromone_matrix.shape != (self._nodes_size, self._nodes_size):
+                raise ValueError("pheromone_matrix must be %d x %d" % (self._nodes_size, self._nodes_size))
+
+        self._best_solution = {"route": None, "cost": float("inf")}
+
+        if initial_solution is not None:
+            self._warm_start(initial_solution["route"])
+
+    def _warm_start(self, routes):
+        """
+        Reinforce the subroutes of a previous solution that are still feasible,
+        the solution becomes the best one if all of them are
+        """
+        nest = self._nest.id
+        # as the ants, a subroute leaves the nest full when it goes to a deficit node
+        feasible = [route for route in routes
+                    if len(route) > 2 and route[0] == nest and route[-1] == nest
+                    and all(0 <= node < self._nodes_size for node in route)
+                    and utils.check_demand(route, self._demand_array, self._max_load,
+                                           self._max_load if self._demand_array[route[1]] < 0 else 0)]
+
+        if not feasible:
+            return
+
+        self._reinforce(feasible)
+
+        customers = [node for route in feasible for node in route[1:-1]]
+
+        # every node but the nest visited exactly once
+        if len(feasible) == len(routes) and len(customers) == len(set(customers)) == self._nodes_size - 1:
+            self._best_solution = {"route": [list(route) for route in feasible],
+                                   "cost": localsearch.solution_cost(feasible, self._distance_matrix)}
+
+    def _reinforce(self, routes):
+        """
+        Evaporate the pheromone and deposit sigma on the arcs of routes, as if they were the best
+        solution of an iteration; unlike _update_pheromones the deposit is clipped between 0.1 and 5
+        instead of skipped, so saturated arcs (as in a fresh matrix) still stand out after the evaporation
+        """
+        from_nodes = np.concatenate([route[:-1] for route in routes]).astype(np.intp)
+        to_nodes = np.concatenate([route[1:] for route in routes]).astype(np.intp)
+
+        self._evaporate_pheromones()
+        self._pheromone_matrix[from_nodes, to_nodes] = np.clip(self._pheromone_matrix[from_nodes, to_nodes] + self._sigma,
+                                                               0.1, 5)
+
+    def save_state(self, path):
+        """
+        Save the pheromone matrix and the best solution found so far to path, see state.save_state
+        """
+        state.save_state(path, self._pheromone_matrix, self._best_solution)
+
+    @property
+    def stats(self):
+        """
+        Stats of the last foraging, None if the colony isn't instrumented
+        """
+        return self._stats
+
+    @property
+    def subroute_cache(self):
+        """
+        The subroute cache of the ants of the colony process, None if disabled
+        """
+        return self._subroute_cache
+
+    @property
+    def pheromone_matrix(self):
+        return self._pheromone_matrix
+
+    def blend_pheromones(self, pheromone_matrix, weight):
+        """
+        Move the pheromone towards pheromone_matrix (for example the one of another colony)
+        weight is the share of pheromone_matrix in the result, the main diagonal is left untouched
+        """
+        blended = (1 - weight) * self._pheromone_matrix + weight * pheromone_matrix
+
+        # in place, the backend reads this matrix
+        np.copyto(self._pheromone_matrix, blended, where=self._off_diagonal)
+
+    def _start_backend(self):
+        """
+        Start the backend, from now on the colony updates the pheromone matrix read by the ants
+        """
+        # a route visits the nest at most once after each other node
+        instance = worker.Instance(self._nest.id, self._nodes_size, self._pheromone_matrix, self._distance_matrix,
+                                   self._heuristic_matrix, self._neighbor_lists, self._candidate_lists,
+                                   self._subroute_cache, self._max_load, self._demand_array, self._alpha, self._lam,
+                                   self._entropy, self._instrument,
+                                   np.full((self._colony_size, 2 * self._nodes_size), -1, dtype=np.int32),
+                                   np.zeros(self._colony_size))
+
+        self._backend = backends.create_backend(self._backend_name, instance, self._colony_size, self._workers)
+        self._pheromone_matrix = self._backend.pheromone_matrix
+
+    def close(self):
+        """
+        Stop the backend and release its resources
+        """
+        if self._backend is not None:
+            # keep a private copy of the pheromone
+            self._pheromone_matrix = self._pheromone_matrix.copy()
+
+            self._backend.close()
+            self._backend = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _budget(self):
+        """
+        Max number of ants the colony evaluates
+        """
+        budget = self._iterations * self._colony_size
+
+        if self._max_evaluations is not None:
+            budget = min(budget, self._max_evaluations)
+
+        return budget
+
+    def _synchronous_batches(self):
+        """
+        Send all the ants of the colony to search food on the current pheromone matrix at each
+        iteration, yielding the iteration, the rows of the ants and their stats
+        The last iteration sends only the ants left in the budget
+        """
+        budget = self._budget()
+        iteration = evaluated = 0
+
+        while evaluated < budget:
+            ants = min(self._colony_size, budget - evaluated)
+            stats = self._backend.forage(iteration, ants)
+
+            yield iteration, 0, ants, stats
+
+            iteration += 1
+            evaluated += ants
+
+    def _asynchronous_batches(self):
+        """
+        Keep a batch of ants searching food in each slot of the backend, yielding each batch as soon
+        as it's done with its number, the rows of its ants and their stats; the batch is sent again
+        when the colony asks for the next one, so the colony reads its rows first
+        The colony evaluates at most iterations * colony_size ants (max_evaluations if lower)
+        """
+        budget = self._budget()
+        done = queue.SimpleQueue()
+        slots = self._backend.slots
+        submitted = batches = running = 0
+
+        def submit(slot):
+            nonlocal submitted, batches, running
+            batch, (first_ant, ants) = batches, slots[slot]
+            ants = min(ants, budget - submitted)
+
+            submitted += ants
+            batches += 1
+            running += 1
+            self._backend.submit(batch, first_ant, ants,
+                                 lambda stats: done.put((slot, batch, first_ant, ants, stats, None)),
+                                 lambda error: done.put((slot, batch, first_ant, ants, None, error)))
+
+        try:
+            for slot in range(len(slots)):
+                if submitted < budget:
+                    submit(slot)
+
+            while running:
+                slot, batch, first_ant, ants, stats, error = done.get()
+                running -= 1
+
+                if error is not None:
+                    raise error
+
+                yield batch, first_ant, ants, stats
+
+                if submitted < budget:
+                    submit(slot)
+        finally:
+            # the ants still searching food write in the rows of the next run
+            while running:
+                done.get()
+                running -= 1
+
+    def _best_ant(self, first_ant, ants):
+        """
+        Return the best solution found by the ants in rows first_ant to first_ant + ants,
+        None if an ant can't find a solution
+        """
+        costs = self._backend.costs[first_ant:first_ant + ants]
+
+        if np.isnan(costs).any():
+            return None
+
+        best_ant = first_ant + int(np.argmin(costs))
+
+        return {"route": worker.load_solution(self._backend.routes[best_ant], self._nest.id),
+                "cost": float(self._backend.costs[best_ant])}
 
-        self._ants_list = self._wake_ants()
+    def _improve_solution(self, solution, stats=None):
+        """
+        Move nodes between the subroutes of a solution while its cost decreases
+        """
+        routes, tried, applied = localsearch.improve_solution(solution["route"], self._distance_matrix, self._demand_array,
+                                                              self._max_load, self._neighbor_lists)
+
+        if stats is not None:
+            stats.count("inter_route_tried", tried)
+            stats.count("inter_route_applied", applied)
+
+        if not applied:
+            return solution
 
-    def _wake_ants(self):
+        return {"route": routes,
+                "cost": localsearch.solution_cost(routes, self._distance_matrix)}
+
+    def _evaporate_pheromones(self, weight=1):
         """
-        Initialize ants for the first pass
+        Evaporate the pheromone of every arc, the main diagonal is left untouched
+        weight is the share of the colony that searched food since the last evaporation
         """
-        return [Ant(self._nest, self._nodes, self._pheromone_matrix, self._distance_matrix,
-                    self._cost_function, self._max_load, self._demand, self._alpha, self._beta, self._gamma, self._lam, self._Q) for _ in range(self._colony_size)]
+        np.multiply(self._pheromone_matrix, (1 - self._rho) ** weight, out=self._pheromone_matrix,
+                    where=self._off_diagonal)
 
-    def _reset_ants(self):
+    def _update_pheromones(self, routes, d_min, d1, weight=1):
         """
-        Reset ants for a next pass (clear visited nodes)
+        Deposit pheromone on the arcs of routes, scaled by weight
+        An arc is updated only if its new value stays between 0.1 and 5
         """
-        for ant in self._ants_list:
-            ant.reset_ant(self._nest, self._nodes, self._pheromone_matrix)
+        from_nodes = np.concatenate([route[:-1] for route in routes]).astype(np.intp)
+        to_nodes = np.concatenate([route[1:] for route in routes]).astype(np.intp)
 
-    def _evaporate_pheromones(self):
-        for i in range(len(self._pheromone_matrix)):
-            for j in range(len(self._pheromone_matrix)):
-                if i != j:
-                    self._pheromone_matrix[i][j] = (
-                        1 - self._rho) * self._pheromone_matrix[i][j]
+        new_pheromone_values = self._pheromone_matrix[from_nodes, to_nodes] + (self._sigma * weight * (d_min / d1))
+        valid = (new_pheromone_values > 0.1) & (new_pheromone_values < 5)
 
-    def _update_pheromones(self, route, d_min, d1):
-        for node, next_node in zip(route, route[1:]):
-            new_pheromone_value = self._pheromone_matrix[node.id][next_node.id] + (
-                self._sigma * (d_min / d1))
-            if new_pheromone_value > 0.1 and new_pheromone_value < 5:
-                self._pheromone_matrix[node.id][next_node.id] = new_pheromone_value
+        self._pheromone_matrix[from_nodes[valid], to_nodes[valid]] = new_pheromone_values[valid]
 
-    def foraging(self):
+    def _stop_reason(self, evaluated, best_cost, stagnant_ants, elapsed, last_batch_time):
+        """
+        Return why the colony should stop after evaluating evaluated ants, or None to go on;
+        stagnant_ants ants didn't improve the best solution and stagnation is counted in colonies of ants
         """
-        Send ants to search food
+        if self._target_cost is not None and best_cost <= self._target_cost:
+            return "target"
+
+        if self._stagnation is not None and stagnant_ants >= self._stagnation * self._colony_size:
+            return "stagnation"
+
+        if evaluated >= self._iterations * self._colony_size:
+            return "iterations"
+
+        if self._max_evaluations is not None and evaluated >= self._max_evaluations:
+            return "max_evaluations"
+
+        # the next batch is expected to last as much as the last one
+        if self._time_limit is not None and elapsed + last_batch_time > self._time_limit:
+            return "time_limit"
+
+        return None
+
+    @staticmethod
+    def _timer(stats, phase):
+        return nullcontext() if stats is None else stats.timer(phase)
+
+    def forage(self):
         """
-        best_solution = {"route": None, "cost": float("inf")}
-        cnt_best_solution = 0
+        Send ants to search food until a stopping condition is met, yielding after each iteration
+        (each batch of ants if the colony is asynchronous) its number, the cost of its best solution,
+        the best solution so far (as node ids), whether it improved in this iteration, the elapsed
+        seconds, the stats of the iteration and the stop reason (None if the colony goes on)
+        It stops without yielding if an ant can't find a solution, the backend stays open until close()
 
-        for _ in range(self._iterations):
-            best_iteration = {"route": None, "cost": float("inf")}
+        A solution sent to the generator, as returned in best_solution by another colony on the
+        same dataset (a migrant), becomes the best solution if it's better and its arcs are reinforced
+        """
+        if self._backend is None:
+            self._start_backend()
 
-            for ant in self._ants_list:
-                ant.start()
+        best_solution = self._best_solution
+        evaluated = stagnant_ants = 0
+        start = iteration_start = time.perf_counter()
+        self._stats = Stats() if self._instrument else None
 
-            for ant in self._ants_list:
-                ant.join()
+        if self._asynchronous:
+            batches = self._asynchronous_batches()
+        else:
+            batches = self._synchronous_batches()
 
-            for ant in self._ants_list:
-                #route = ant.begin_route()
-                route = self._Q.get()
+        with closing(batches):
+            while True:
+                stats = Stats() if self._instrument else None
+
+                with self._timer(stats, "foraging"):
+                    batch = next(batches, None)
+
+                # no ant to send (no iterations or no evaluations allowed)
+                if batch is None:
+                    return
+
+                iteration, first_ant, ants, ant_stats = batch
+                best_iteration = self._best_ant(first_ant, ants)
 
                 # if there isn't any solution
-                if(route["route"] is None and route["cost"] is None):
-                    return None
+                if best_iteration is None:
+                    return
+
+                if self._inter_route:
+                    with self._timer(stats, "inter_route"):
+                        best_iteration = self._improve_solution(best_iteration, stats)
+
+                evaluated += ants
+
+                # save best route for all the iterations
+                if (best_iteration["cost"] < best_solution["cost"]):
+                    best_solution = self._best_solution = best_iteration
+                    stagnant_ants = 0
+                else:
+                    stagnant_ants += ants
+
+                # a batch of ants weighs as its share of the colony
+                weight = ants / self._colony_size
 
-                # save best route for the current iteration
-                if (route["cost"] < best_iteration["cost"]):
-                    best_iteration = route
+                with self._timer(stats, "pheromone_update"):
+                    # evaporate pheromone
+                    self._evaporate_pheromones(weight)
 
-            # save best route for all the iterations
-            if (best_iteration["cost"] < best_solution["cost"]):
-                best_solution = best_iteration
-                cnt_best_solution = 0
-            else:
-                cnt_best_solution += 1
+                    # update pheromone
+                    self._update_pheromones(best_iteration["route"], best_solution["cost"], best_iteration["cost"], weight)
 
-            # evaporate pheromone
-            self._evaporate_pheromones()
+                if stats is not None:
+                    stats.merge(ant_stats)
+                    self._stats.merge(stats)
 
-            # update pheromone
-            for route in best_iteration["route"]:
-                self._update_pheromones(
-                    route, best_solution["cost"], best_iteration["cost"])
+                now = time.perf_counter()
+                stop_reason = self._stop_reason(evaluated, best_solution["cost"], stagnant_ants,
+                                                now - start, now - iteration_start)
+                iteration_start = now
+
+                migrant = yield {"iteration": iteration,
+                                 "cost": best_iteration["cost"],
+                                 "best_solution": best_solution,
+                                 "improved": stagnant_ants == 0,
+                                 "elapsed": now - start,
+                                 "stats": stats,
+                                 "stop_reason": stop_reason}
+
+                if stop_reason is not None:
+                    return
+
+                if migrant is not None and migrant["cost"] < best_solution["cost"]:
+                    best_solution = self._best_solution = migrant
+                    stagnant_ants = 0
+                    self._update_pheromones(migrant["route"], migrant["cost"], migrant["cost"])
+
+    def solutions(self):
+        """
+        Send ants to search food, yielding each new best solution as soon as it's found
+        with the iteration number and the elapsed seconds
+
+        The colony stops when a stopping condition is met or when the caller stops
+        iterating (break or close()), the backend stays open until close()
+        """
+        for progress in self.forage():
+            if progress["improved"]:
+                solution = self._to_nodes(progress["best_solution"])
+                solution["iteration"] = progress["iteration"]
+                solution["elapsed"] = progress["elapsed"]
+
+                yield solution
+
+    def foraging(self, on_iteration=None):
+        """
+        Send ants to search food until a stopping condition is met
+        It returns the best solution with the number of iterations run (batches of ants if the
+        colony is asynchronous) and the stop reason:
+        "target", "stagnation", "iterations", "max_evaluations" or "time_limit"
+
+        on_iteration is called after each iteration (or batch) with a dict of the iteration number,
+        the cost of its best solution, the best cost so far, the elapsed seconds and,
+        if the colony is instrumented, the stats of the iteration
+        """
+        progress = None
+        iterations = 0
+
+        for progress in self.forage():
+            iterations += 1
+
+            if on_iteration is not None:
+                stats = progress["stats"]
+                on_iteration({"iteration": progress["iteration"],
+                              "cost": progress["cost"],
+                              "best_cost": progress["best_solution"]["cost"],
+                              "elapsed": progress["elapsed"],
+                              "stats": None if stats is None else stats.as_dict()})
+
+        # if there isn't any solution
+        if progress is None or progress["stop_reason"] is None:
+            return None
+
+        solution = self._to_nodes(progress["best_solution"])
+        solution["iterations"] = iterations
+        solution["stop_reason"] = progress["stop_reason"]
+
+        return solution
+
+    def _to_nodes(self, solution):
+        """
+        Replace the node ids of a solution with the nodes given to the colony
+        """
+        routes = [[self._node_lookup[node] for node in route] for route in solution["route"]]
 
-            self._reset_ants()
+        if self._cost_function is None:
+            cost = solution["cost"]
+        else:
+            cost = sum(utils.calculate_route_cost(self._cost_function, route) for route in routes)
 
-        return best_solution
+        return {"route": routes,
+                "cost": cost}
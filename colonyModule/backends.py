@@ -0,0 +1,210 @@
+"""
+Execution backends of Colony.foraging
+
+A backend sends all the ants of an iteration to search food, each ant writes its
+route in a row of backend.routes and its cost in backend.costs. The colony updates
+backend.pheromone_matrix in place between two iterations. Every ant draws from its
+own random stream, so all the backends give the same results for the same seed.
+When the instance is instrumented, forage returns the stats of all the ants.
+
+For the asynchronous colony, submit sends a batch of ants without waiting for it
+and calls back with their stats (or the error) when they are done; each batch
+uses the rows of one of the backend slots.
+"""
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool, cpu_count
+import numpy as np
+from colonyModule import worker
+from colonyModule.shared import SharedArray
+from colonyModule.stats import Stats
+
+
+def _merge_stats(results):
+    """
+    Merge the stats returned by the workers, None if the instance isn't instrumented
+    """
+    if results[0] is None:
+        return None
+
+    stats = Stats()
+
+    for result in results:
+        stats.merge(result)
+
+    return stats
+
+
+class SerialBackend:
+    """
+    Runs the ants one after the other in the colony process
+
+    Parameters:
+      instance: worker.Instance with the data of the colony
+      colony_size: number of ants in colony
+      workers: unused, the ants run in a single thread
+    """
+
+    def __init__(self, instance, colony_size, workers=None):
+        self._colony_size = colony_size
+        self._instance = instance
+
+    @property
+    def pheromone_matrix(self):
+        return self._instance.pheromone_matrix
+
+    @property
+    def routes(self):
+        return self._instance.routes
+
+    @property
+    def costs(self):
+        return self._instance.costs
+
+    @property
+    def slots(self):
+        """
+        Rows of the ants that can search food at the same time, as (first_ant, ants) pairs
+        """
+        return [(0, self._colony_size)]
+
+    def forage(self, iteration, ants=None):
+        """
+        Send the first ants of the colony (all of them by default) to search food
+        """
+        stats = worker.forage_ants(self._instance, iteration, 0, ants or self._colony_size)
+
+        return None if stats is None else Stats(stats["timers"], stats["counters"])
+
+    def submit(self, iteration, first_ant, ants, callback, error_callback):
+        try:
+            stats = worker.forage_ants(self._instance, iteration, first_ant, ants)
+        except Exception as e:
+            error_callback(e)
+        else:
+            callback(stats)
+
+    def close(self):
+        pass
+
+    def _chunks(self, workers, ants=None):
+        """
+        Split the first ants (all of them by default) evenly between the workers, as (first_ant, ants) pairs
+        """
+        return [(int(chunk[0]), len(chunk)) for chunk in np.array_split(range(ants or self._colony_size), workers)
+                if len(chunk)]
+
+
+class ThreadBackend(SerialBackend):
+    """
+    Runs the ants on a pool of threads of the colony process
+    """
+
+    def __init__(self, instance, colony_size, workers=None):
+        super(ThreadBackend, self).__init__(instance, colony_size)
+        self._workers = min(workers or cpu_count(), colony_size)
+        self._executor = ThreadPoolExecutor(self._workers)
+
+    @property
+    def slots(self):
+        return self._chunks(self._workers)
+
+    def forage(self, iteration, ants=None):
+        futures = [self._executor.submit(worker.forage_ants, self._instance, iteration, first_ant, chunk)
+                   for first_ant, chunk in self._chunks(self._workers, ants)]
+
+        return _merge_stats([future.result() for future in futures])
+
+    def submit(self, iteration, first_ant, ants, callback, error_callback):
+        def done(future):
+            if future.exception() is not None:
+                error_callback(future.exception())
+            else:
+                callback(future.result())
+
+        self._executor.submit(worker.forage_ants, self._instance, iteration, first_ant, ants).add_done_callback(done)
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class ProcessBackend(SerialBackend):
+    """
+    Runs the ants on a pool of long-lived worker processes
+
+    The matrices and the output buffers are moved to shared memory, the workers
+    attach to them once when they start. The pool and the shared memory are released
+    by close() or when the backend is garbage collected.
+    """
+
+    def __init__(self, instance, colony_size, workers=None):
+        super(ProcessBackend, self).__init__(instance, colony_size)
+        self._workers = min(workers or cpu_count(), colony_size)
+
+        self._shared_arrays = [SharedArray.from_array(instance.pheromone_matrix),
+                               SharedArray.from_array(instance.distance_matrix),
+                               SharedArray.from_array(instance.heuristic_matrix),
+                               SharedArray.from_array(instance.routes),
+                               SharedArray.from_array(instance.costs)]
+
+        pheromone_matrix, distance_matrix, heuristic_matrix, routes, costs = [shared.array for shared in self._shared_arrays]
+        self._instance = instance._replace(pheromone_matrix=pheromone_matrix, distance_matrix=distance_matrix,
+                                           heuristic_matrix=heuristic_matrix, routes=routes, costs=costs)
+
+        # the workers get the instance without its matrices, they read the shared ones
+        light_instance = instance._replace(pheromone_matrix=None, distance_matrix=None, heuristic_matrix=None,
+                                           routes=None, costs=None)
+        self._pool = Pool(self._workers, worker.init_worker,
+                          (light_instance, [shared.descriptor() for shared in self._shared_arrays]))
+        self._finalizer = weakref.finalize(self, ProcessBackend._release, self._pool, self._shared_arrays)
+
+    @property
+    def slots(self):
+        return self._chunks(self._workers)
+
+    def submit(self, iteration, first_ant, ants, callback, error_callback):
+        self._pool.apply_async(worker.forage, (iteration, first_ant, ants), callback=callback,
+                               error_callback=error_callback)
+
+    def forage(self, iteration, ants=None):
+        return _merge_stats(self._pool.starmap(worker.forage, [(iteration, first_ant, chunk)
+                                                               for first_ant, chunk in self._chunks(self._workers, ants)]))
+
+    def close(self):
+        self._finalizer()
+
+    @staticmethod
+    def _release(pool, shared_arrays):
+        pool.terminate()
+
+        for shared in shared_arrays:
+            shared.close()
+
+
+BACKENDS = {"serial": SerialBackend,
+            "threads": ThreadBackend,
+            "processes": ProcessBackend}
+
+
+def choose_backend(nodes_size, colony_size):
+    """
+    Choose the fastest backend for an instance
+    Small instances can't pay back the cost of moving the work to other processes
+    """
+    if cpu_count() == 1 or nodes_size ** 2 * colony_size < 50000:
+        return "serial"
+
+    return "processes"
+
+
+def create_backend(name, instance, colony_size, workers=None):
+    """
+    Create the backend called name ("serial", "threads", "processes" or "auto")
+    """
+    if name == "auto":
+        name = choose_backend(instance.nodes_size, colony_size)
+
+    if name not in BACKENDS:
+        raise ValueError("unknown backend " + repr(name) + ", expected one of " + ", ".join(list(BACKENDS) + ["auto"]))
+
+    return BACKENDS[name](instance, colony_size, workers)
@@ -0,0 +1,71 @@
+"""
+Solve many datasets over a bounded pool of processes
+
+Every job is solved in a process of the pool with its ants running serially, so
+the number of busy cores never exceeds the size of the pool. The results are
+yielded as soon as each job finishes, and a job that fails is reported with its
+error without stopping the others.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from colonyModule import solver
+from colonyModule.dataset import load_dataset
+
+
+def _solve_job(job):
+    """
+    Solve a job in a pool process, loading its dataset if it's a path
+    """
+    dataset = job["dataset"]
+
+    if isinstance(dataset, str):
+        dataset = load_dataset(dataset)
+
+    options = dict({"backend": "serial"}, **job.get("options", {}))
+
+    return solver.solve(dataset, job.get("parameters"), **options)
+
+
+def _job_name(job):
+    dataset = job["dataset"]
+
+    return os.path.basename(dataset) if isinstance(dataset, str) else dataset.name
+
+
+def solve_batch(jobs, workers=None):
+    """
+    Solve the jobs in a pool of workers processes (by default one for each cpu),
+    yielding the solution of each job as soon as it's ready
+
+    A job is a dict with the dataset (a Dataset or the path of a dataset file) and optionally
+    the parameters (see solver.DEFAULT_PARAMETERS) and the options (keyword arguments of Colony).
+    Each solution is the one of solver.solve, or the dataset name with the error of a failed job,
+    with the index of its job, the number of jobs completed so far and the throughput
+    in jobs per minute since the start of the batch; the jobs not started yet are
+    cancelled if the caller stops iterating
+    """
+    start = time.time()
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {executor.submit(_solve_job, job): index for index, job in enumerate(jobs)}
+
+        try:
+            for completed, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+
+                try:
+                    solution = future.result()
+                except Exception as e:
+                    solution = {"dataset": _job_name(jobs[index]), "error": repr(e)}
+
+                elapsed = time.time() - start
+
+                solution["index"] = index
+                solution["completed"] = completed
+                solution["throughput"] = completed / elapsed * 60 if elapsed > 0 else None
+
+                yield solution
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,121 @@
+"""
+Loading of the bike sharing rebalancing instances of the unimore BRP format
+
+An instance file has the number of nodes on the first line, the demand of each
+node on the second line, the capacity of the vehicles on the third line and then
+the n x n cost matrix, one row for each line.
+
+The cost matrix is parsed in bulk and saved in a sidecar .npy file next to the
+instance, the next loads only read the three header lines and memory map the matrix.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+Dataset = namedtuple("Dataset", ["name", "n_nodes", "demand", "max_load", "cost_matrix"])
+
+
+def _cache_path(path):
+    return path + ".npy"
+
+
+def _parse_header(path, lines):
+    """
+    Parse and validate the number of nodes, the demand and the capacity
+    """
+    try:
+        n_nodes = int(lines[0])
+        demand = [int(q) for q in lines[1].split()]
+        max_load = int(lines[2])
+    except (IndexError, ValueError) as e:
+        raise ValueError(path + ": invalid header, " + str(e))
+
+    if n_nodes < 2:
+        raise ValueError(path + ": an instance needs at least 2 nodes, got " + str(n_nodes))
+
+    if len(demand) != n_nodes:
+        raise ValueError(path + ": expected " + str(n_nodes) + " demands, got " + str(len(demand)))
+
+    if max_load <= 0:
+        raise ValueError(path + ": the capacity must be positive, got " + str(max_load))
+
+    return n_nodes, demand, max_load
+
+
+def _parse_costs(path, text, n_nodes):
+    try:
+        cost_matrix = np.array(text.split(), dtype=float)
+    except ValueError as e:
+        raise ValueError(path + ": invalid cost matrix, " + str(e))
+
+    if cost_matrix.size != n_nodes * n_nodes:
+        raise ValueError(path + ": expected " + str(n_nodes * n_nodes) + " costs, got " + str(cost_matrix.size))
+
+    if not np.isfinite(cost_matrix).all():
+        raise ValueError(path + ": the costs must be finite")
+
+    return cost_matrix.reshape(n_nodes, n_nodes)
+
+
+def _load_cache(path, n_nodes):
+    """
+    Memory map the cached cost matrix if it's still valid
+    """
+    cache = _cache_path(path)
+
+    try:
+        if os.path.getmtime(cache) < os.path.getmtime(path):
+            return None
+
+        cost_matrix = np.load(cache, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+
+    if cost_matrix.shape != (n_nodes, n_nodes):
+        return None
+
+    return cost_matrix
+
+
+def _save_cache(path, cost_matrix):
+    cache = _cache_path(path)
+    temporary = cache + "." + str(os.getpid()) + ".tmp"
+
+    try:
+        with open(temporary, "wb") as f:
+            np.save(f, cost_matrix)
+
+        # other processes never see a half written cache
+        os.replace(temporary, cache)
+    except OSError:
+        # the dataset directory may be read only, the cache is only an optimization
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def load_dataset(path, cache=True):
+    """
+    Load an instance file, with cache the cost matrix is memory mapped from its sidecar file
+    """
+    with open(path, "r") as f:
+        header = [f.readline() for _ in range(3)]
+        n_nodes, demand, max_load = _parse_header(path, header)
+
+        cost_matrix = _load_cache(path, n_nodes) if cache else None
+
+        if cost_matrix is None:
+            cost_matrix = _parse_costs(path, f.read(), n_nodes)
+
+            if cache:
+                _save_cache(path, cost_matrix)
+
+    return Dataset(os.path.basename(path), n_nodes, demand, max_load, cost_matrix)
+
+
+def load_datasets(paths, cache=True, workers=None):
+    """
+    Load many instance files, in parallel
+    """
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(lambda path: load_dataset(path, cache), paths))
@@ -0,0 +1,164 @@
+"""
+Solve large datasets by spatial decomposition
+
+The stations are partitioned into zones on the cost matrix, each zone is solved
+as its own dataset (the nest plus the stations of the zone) in a pool of
+processes, then the routes of the zones are stitched into a single solution,
+since all of them start and end in the nest. A final repair pass moves stations
+between the routes of neighboring zones with the inter-route local search.
+"""
+import math
+import time
+import numpy as np
+from colonyModule import heuristics, localsearch
+from colonyModule.batch import solve_batch
+from colonyModule.dataset import Dataset
+
+NEST = 0
+
+
+def _medoids(cost_matrix, customers, zones):
+    """
+    Spread zones medoids over the customers, each one the farthest from the ones already chosen
+    The cost of a node to itself must be zero
+    """
+    first = int(np.argmax(cost_matrix[NEST, customers]))
+    medoids = [customers[first]]
+    distance = cost_matrix[medoids[0], customers].astype(float)
+    distance[first] = -np.inf
+
+    while len(medoids) < zones:
+        chosen = int(np.argmax(distance))
+        medoid = customers[chosen]
+        medoids.append(medoid)
+        distance = np.minimum(distance, cost_matrix[medoid, customers])
+        # a customer at zero cost from every medoid mustn't be chosen twice
+        distance[chosen] = -np.inf
+
+    return medoids
+
+
+def partition(dataset, zones):
+    """
+    Partition the customers of a dataset (every node but the nest) into zones
+
+    Each customer goes to the zone of its nearest medoid, then customers are moved
+    to their second nearest zone while that brings the net demand of a zone, the
+    load left or needed after serving all of it, back within max_load.
+    It returns a list of arrays of node ids
+    """
+    # the instances have a huge cost from a station to itself, a medoid is in its own zone
+    cost_matrix = np.array(dataset.cost_matrix, dtype=float)
+    np.fill_diagonal(cost_matrix, 0)
+    demand = np.asarray(dataset.demand)
+    customers = np.arange(1, dataset.n_nodes)
+    zones = max(1, min(zones, len(customers)))
+
+    medoids = _medoids(cost_matrix, customers, zones)
+    # distance of each customer from the medoid of each zone
+    distance = cost_matrix[np.ix_(customers, medoids)].astype(float)
+    zone = np.argmin(distance, axis=1)
+    net = np.bincount(zone, weights=demand[customers], minlength=zones)
+
+    # a customer moves at most once, so the balancing ends
+    moved = np.zeros(len(customers), dtype=bool)
+
+    for z in np.argsort(-np.abs(net)):
+        while abs(net[z]) > dataset.max_load:
+            # customers of z whose demand has the sign of the imbalance
+            candidates = np.flatnonzero((zone == z) & ~moved & (np.sign(demand[customers]) == np.sign(net[z])))
+
+            if not len(candidates):
+                break
+
+            # cheapest move to another zone that doesn't unbalance it
+            best = None
+
+            for c in candidates:
+                q = demand[customers[c]]
+
+                for other in np.argsort(distance[c]):
+                    if other != z and abs(net[other] + q) <= max(abs(net[other]), dataset.max_load):
+                        cost = distance[c, other] - distance[c, z]
+
+                        if best is None or cost < best[0]:
+                            best = (cost, c, other)
+                        break
+
+            if best is None:
+                break
+
+            _, c, other = best
+            zone[c] = other
+            moved[c] = True
+            net[z] -= demand[customers[c]]
+            net[other] += demand[customers[c]]
+
+    return [customers[zone == z] for z in range(zones) if (zone == z).any()]
+
+
+def zone_dataset(dataset, zone, index):
+    """
+    The dataset of a zone, the nest is node 0 and the stations of zone follow in order
+    """
+    nodes = np.concatenate(([NEST], zone))
+
+    return Dataset("%s#%d" % (dataset.name, index), len(nodes), np.asarray(dataset.demand)[nodes],
+                   dataset.max_load, np.asarray(dataset.cost_matrix)[np.ix_(nodes, nodes)])
+
+
+def solve_decomposed(dataset, zones=None, zone_size=100, parameters=None, workers=None, neighbors=10, **options):
+    """
+    Solve a dataset zone by zone
+
+    Parameters:
+      dataset: the dataset to solve (see colonyModule.dataset)
+      zones: number of zones, by default enough for zone_size stations each
+      zone_size: stations of each zone when zones isn't given
+      parameters: parameters of the colony of each zone (see solver.DEFAULT_PARAMETERS)
+      workers: processes solving the zones, by default one for each cpu
+      neighbors: nearest nodes tried by the repair moves of each node, None to try all the nodes
+      options: keyword arguments of the colony of each zone
+
+    It returns the solution as subroutes of node ids with its cost, the cost before the
+    repair pass, the cost of each zone and the wall time; route and cost are None if a zone
+    can't be solved
+    """
+    start = time.time()
+
+    if zones is None:
+        zones = math.ceil((dataset.n_nodes - 1) / zone_size)
+
+    partitions = partition(dataset, zones)
+    options = dict(options, neighbors=neighbors)
+    jobs = [{"dataset": zone_dataset(dataset, zone, i), "parameters": parameters, "options": options}
+            for i, zone in enumerate(partitions)]
+
+    zone_routes, zone_costs = [None] * len(jobs), [None] * len(jobs)
+
+    for solution in solve_batch(jobs, workers):
+        if "error" in solution or solution["cost"] is None:
+            return {"route": None, "cost": None, "stitched_cost": None, "zone_costs": zone_costs,
+                    "dataset": dataset.name, "time": time.time() - start, "error": solution.get("error")}
+
+        # the ids of a zone dataset are positions in [nest] + zone
+        nodes = np.concatenate(([NEST], partitions[solution["index"]])).tolist()
+        zone_routes[solution["index"]] = [[nodes[node] for node in route] for route in solution["route"]]
+        zone_costs[solution["index"]] = solution["cost"]
+
+    # stitched in zone order, the repair pass doesn't depend on which zone finished first
+    routes = [route for routes in zone_routes for route in routes]
+
+    cost_matrix = np.asarray(dataset.cost_matrix, dtype=float)
+    stitched_cost = localsearch.solution_cost(routes, cost_matrix)
+
+    neighbor_lists = None if neighbors is None else heuristics.default_cache.neighbors(cost_matrix, neighbors)
+    routes, _, _ = localsearch.improve_solution(routes, cost_matrix, np.asarray(dataset.demand),
+                                                dataset.max_load, neighbor_lists)
+
+    return {"route": routes,
+            "cost": localsearch.solution_cost(routes, cost_matrix),
+            "stitched_cost": stitched_cost,
+            "zone_costs": zone_costs,
+            "dataset": dataset.name,
+            "time": time.time() - start}
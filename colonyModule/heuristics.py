@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+import numpy as np
+from colonyModule import utils
+
+
+class HeuristicCache:
+    """
+    Keeps the heuristic matrices (eta * mi) and the neighbor lists of the instances already seen
+
+    A matrix is computed once for each distance matrix and parameters and then
+    shared by all the colonies (and their ants) that use the same instance.
+    Entries are keyed by the content of the distance matrix, so a changed matrix
+    is never served a stale heuristic.
+
+    Parameters:
+      maxsize: max number of matrices kept, the least recently used one is dropped first
+    """
+
+    def __init__(self, maxsize=32):
+        self._maxsize = maxsize
+        self._matrices = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, distance_matrix, beta, gamma):
+        """
+        Return the heuristic matrix of distance_matrix, computing it only on the first request
+        """
+        distance_matrix = np.asarray(distance_matrix, dtype=float)
+
+        return self._lookup(("heuristic", self._fingerprint(distance_matrix), beta, gamma),
+                            lambda: utils.calculate_heuristic(distance_matrix, beta, gamma))
+
+    def neighbors(self, distance_matrix, k):
+        """
+        Return the k nearest nodes of each node of distance_matrix, computing them only on the first request
+        """
+        distance_matrix = np.asarray(distance_matrix, dtype=float)
+
+        return self._lookup(("neighbors", self._fingerprint(distance_matrix), k),
+                            lambda: utils.calculate_neighbors(distance_matrix, k))
+
+    def _lookup(self, key, calculate):
+        with self._lock:
+            matrix = self._matrices.get(key)
+
+            if matrix is not None:
+                self._matrices.move_to_end(key)
+                return matrix
+
+        matrix = calculate()
+        # the matrix is shared, nobody should change it
+        matrix.flags.writeable = False
+
+        with self._lock:
+            self._matrices[key] = matrix
+
+            while len(self._matrices) > self._maxsize:
+                self._matrices.popitem(last=False)
+
+        return matrix
+
+    def clear(self):
+        with self._lock:
+            self._matrices.clear()
+
+    def __len__(self):
+        return len(self._matrices)
+
+    @staticmethod
+    def _fingerprint(distance_matrix):
+        return (distance_matrix.shape, distance_matrix.dtype.str,
+                blake2b(distance_matrix.tobytes(), digest_size=16).digest())
+
+
+# cache shared by every colony of the process
+default_cache = HeuristicCache()
@@ -0,0 +1,173 @@
+"""
+Island model: several independent colonies on the same dataset
+
+Each island is a colony in its own process, with its own seed and optionally its
+own parameters, so its ants never wait for the ants of the other islands. Every
+migration_interval iterations the islands stop, the best solution of each island
+migrates to the next one in a ring and, with blend > 0, the pheromone matrix of
+each island moves towards the mean pheromone matrix of all the islands.
+"""
+import time
+from multiprocessing import Pipe, Process, cpu_count
+import numpy as np
+from colonyModule import solver
+
+
+def _island(connection, dataset, parameters, options):
+    """
+    Run a colony in an island process, driven by the commands of run_islands
+    It replies "ready" once the colony is created
+
+    A ("run", iterations, migrant, pheromone_matrix, blend) command runs the colony for up to
+    iterations iterations after receiving migrant and blending pheromone_matrix (both can be None),
+    the reply is the best solution of the island, its stop reason (None if it goes on) and, with
+    blend > 0, its pheromone matrix
+    """
+    try:
+        with solver.create_colony(dataset, parameters, **options) as colony:
+            connection.send("ready")
+            progress = colony.forage()
+            migrant = None
+            last = None
+            iterations_run = 0
+
+            while True:
+                command = connection.recv()
+
+                if command[0] == "stop":
+                    break
+
+                _, iterations, migrant, pheromone_matrix, blend = command
+
+                if pheromone_matrix is not None:
+                    colony.blend_pheromones(pheromone_matrix, blend)
+
+                for _ in range(iterations):
+                    last = next(progress) if last is None else progress.send(migrant)
+                    migrant = None
+                    iterations_run += 1
+
+                    if last["stop_reason"] is not None:
+                        break
+
+                connection.send({"best_solution": last["best_solution"],
+                                 "iterations": iterations_run,
+                                 "stop_reason": last["stop_reason"],
+                                 "pheromone_matrix": colony.pheromone_matrix.copy() if blend > 0 else None})
+    except StopIteration:
+        # an ant couldn't find a solution
+        connection.send(None)
+    except Exception as e:
+        connection.send(e)
+    finally:
+        connection.close()
+
+
+def run_islands(dataset, islands=None, parameters=None, migration_interval=10, blend=0.0, seed=None, **options):
+    """
+    Solve a dataset with several colonies exchanging their best solutions
+
+    Parameters:
+      dataset: the dataset to solve (see colonyModule.dataset)
+      islands: number of colonies, by default one for each cpu
+      parameters: parameters of all the colonies (see solver.DEFAULT_PARAMETERS), or a list with the ones of each colony
+      migration_interval: iterations between two migrations
+      blend: share of the mean pheromone matrix blended into each colony at each migration, 0 to exchange only solutions
+      seed: seed of the islands, each colony gets its own seed derived from it
+      options: keyword arguments of every Colony, the ants of an island run serially by default
+
+    It returns the best solution of all the islands as subroutes of node ids, with its cost,
+    wall time, the island that found it, the iterations run by each island and their best costs;
+    route and cost are None if an island can't find any solution
+    """
+    if isinstance(parameters, list):
+        islands = len(parameters)
+    else:
+        islands = islands or cpu_count()
+        parameters = [parameters] * islands
+
+    options = dict({"backend": "serial"}, **options)
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(islands)]
+
+    connections, processes = [], []
+    start = time.time()
+
+    for island_parameters, island_seed in zip(parameters, seeds):
+        connection, island_connection = Pipe()
+        process = Process(target=_island, args=(island_connection, dataset, island_parameters,
+                                                dict(options, seed=island_seed)), daemon=True)
+        process.start()
+        island_connection.close()
+
+        connections.append(connection)
+        processes.append(process)
+
+    results = [None] * islands
+    failed = False
+    # an island may be running or blocked sending its result when an error is raised
+    finished = False
+
+    try:
+        migrants = [None] * islands
+        pheromone_matrix = None
+        active = list(range(islands))
+
+        for connection in connections:
+            result = connection.recv()
+
+            if isinstance(result, Exception):
+                raise result
+
+        while active:
+            for i in active:
+                connections[i].send(("run", migration_interval, migrants[i], pheromone_matrix, blend))
+
+            for i in active:
+                result = connections[i].recv()
+
+                if isinstance(result, Exception):
+                    raise result
+
+                results[i] = result
+
+            if any(result is None for result in results):
+                failed = True
+                break
+
+            active = [i for i in active if results[i]["stop_reason"] is None]
+
+            # ring migration, an island receives the best solution of the previous one
+            migrants = [results[i - 1]["best_solution"] for i in range(islands)]
+
+            if blend > 0:
+                pheromone_matrix = np.mean([result["pheromone_matrix"] for result in results], axis=0)
+
+        finished = True
+    finally:
+        for connection, process in zip(connections, processes):
+            if not finished:
+                process.terminate()
+            elif process.is_alive():
+                try:
+                    connection.send(("stop",))
+                except (BrokenPipeError, OSError):
+                    pass
+
+            connection.close()
+            process.join()
+
+    end = time.time()
+
+    if failed:
+        return {"route": None, "cost": None, "dataset": dataset.name, "time": end - start,
+                "island": None, "iterations": None, "island_costs": None}
+
+    best = min(range(islands), key=lambda i: results[i]["best_solution"]["cost"])
+
+    return {"route": results[best]["best_solution"]["route"],
+            "cost": results[best]["best_solution"]["cost"],
+            "dataset": dataset.name,
+            "time": end - start,
+            "island": best,
+            "iterations": [result["iterations"] for result in results],
+            "island_costs": [result["best_solution"]["cost"] for result in results]}
@@ -0,0 +1,368 @@
+"""
+Local search operators on routes of node ids
+
+A subroute starts and ends at the nest and its load, the sum of the demands of the
+visited nodes starting from zero, must stay between 0 and max_load as checked by
+utils.check_demand. The cost of an arc can be different in the two directions.
+"""
+import itertools
+import numpy as np
+
+# smallest improvement accepted, avoids cycling on rounding errors
+EPSILON = 1e-9
+
+
+def _range_tables(values):
+    """
+    Sparse tables of values for range min and max queries in constant time
+    """
+    mins, maxs = [values], [values]
+    width = 1
+
+    while 2 * width <= len(values):
+        mins.append(np.minimum(mins[-1][:-width], mins[-1][width:]))
+        maxs.append(np.maximum(maxs[-1][:-width], maxs[-1][width:]))
+        width *= 2
+
+    return [level.tolist() for level in mins], [level.tolist() for level in maxs]
+
+
+def _range_min_max(tables, start, end):
+    """
+    Min and max of values[start:end + 1]
+    """
+    mins, maxs = tables
+    level = (end - start + 1).bit_length() - 1
+    other = end - (1 << level) + 1
+
+    return min(mins[level][start], mins[level][other]), max(maxs[level][start], maxs[level][other])
+
+
+def _two_opt_moves(route, neighbor_lists):
+    """
+    Generate the (i, j) pairs of the 2-opt moves that reverse route[i:j + 1]
+    With neighbor_lists only the moves that add an arc towards a near node are generated
+    """
+    last = len(route) - 2
+
+    if neighbor_lists is None:
+        for i in range(1, last):
+            for j in range(i + 1, last + 1):
+                yield i, j
+        return
+
+    position = {node: i for i, node in enumerate(route[1:-1], 1)}
+    nest = route[0]
+
+    for i in range(1, last):
+        # new arc route[i - 1] -> route[j]
+        for node in neighbor_lists[route[i - 1]].tolist():
+            j = position.get(node)
+            if j is not None and j > i:
+                yield i, j
+
+        # new arc route[i] -> route[j + 1]
+        for node in neighbor_lists[route[i]].tolist():
+            j = last if node == nest else position.get(node, 0) - 1
+            if j > i:
+                yield i, j
+
+
+def two_opt(route, distance_matrix, demand, max_load, neighbor_lists=None):
+    """
+    Improve a subroute with 2-opt moves until no move lowers its cost
+
+    A move reverses route[i:j + 1]. Its cost is evaluated in constant time from the
+    forward and backward prefix costs of the route, and its feasibility from the
+    prefix loads. With neighbor_lists (the nearest nodes of each node) only the
+    moves that add an arc from a node to one of its neighbors are tried.
+    It returns the improved route and the number of moves tried and applied
+    """
+    route = list(route)
+    tried = applied = 0
+
+    if len(route) < 4:
+        return route, tried, applied
+
+    while True:
+        arcs_from, arcs_to = route[:-1], route[1:]
+        # forward[t] is the cost of route[:t + 1], backward[t] the cost of the same nodes visited backwards
+        forward = [0.0] + np.cumsum(distance_matrix[arcs_from, arcs_to]).tolist()
+        backward = [0.0] + np.cumsum(distance_matrix[arcs_to, arcs_from]).tolist()
+
+        loads = np.cumsum(demand[route])
+        valid = (loads >= 0) & (loads <= max_load)
+        prefix_valid = np.logical_and.accumulate(valid).tolist()
+        suffix_valid = np.logical_and.accumulate(valid[::-1])[::-1].tolist()
+        tables = _range_tables(loads)
+        loads = loads.tolist()
+
+        best_delta, best_move = -EPSILON, None
+
+        for i, j in _two_opt_moves(route, neighbor_lists):
+            tried += 1
+
+            delta = (distance_matrix[route[i - 1], route[j]] + backward[j] - backward[i] +
+                     distance_matrix[route[i], route[j + 1]] - forward[j + 1] + forward[i - 1])
+
+            if delta >= best_delta or not (prefix_valid[i - 1] and suffix_valid[j + 1]):
+                continue
+
+            # loads inside the reversed part are loads[i - 1] + loads[j] - loads[t] with i - 1 <= t < j
+            low, high = _range_min_max(tables, i - 1, j - 1)
+
+            if loads[i - 1] + loads[j] - low <= max_load and loads[i - 1] + loads[j] - high >= 0:
+                best_delta, best_move = delta, (i, j)
+
+        if best_move is None:
+            return route, tried, applied
+
+        i, j = best_move
+        route[i:j + 1] = route[i:j + 1][::-1]
+        applied += 1
+
+
+def solution_cost(routes, distance_matrix):
+    """
+    Cost of all the subroutes of a solution
+    """
+    return float(sum(distance_matrix[route[:-1], route[1:]].sum() for route in routes))
+
+
+def _route_data(route, demand, max_load):
+    """
+    Prefix loads of a subroute, whether each prefix is feasible and min and max of each suffix of the loads
+    The suffix lists have an extra element for the empty suffix
+    """
+    loads = np.cumsum(demand[route])
+    valid = (loads >= 0) & (loads <= max_load)
+
+    suffix_min = np.append(np.minimum.accumulate(loads[::-1])[::-1], np.inf)
+    suffix_max = np.append(np.maximum.accumulate(loads[::-1])[::-1], -np.inf)
+
+    return loads.tolist(), np.logical_and.accumulate(valid).tolist(), suffix_min.tolist(), suffix_max.tolist()
+
+
+def _suffix_fits(data, start, shift, max_load):
+    """
+    Check if the loads of a subroute from start to the end stay feasible when shifted by shift
+    """
+    return data[2][start] + shift >= 0 and data[3][start] + shift <= max_load
+
+
+def _relocate_moves(routes, position, neighbor_lists, nest):
+    """
+    Generate the ("relocate", a, p, length, b, q) moves: route a loses route[a][p:p + length],
+    which is inserted in route b after position q
+    """
+    for a, route in enumerate(routes):
+        for p in range(1, len(route) - 1):
+            for length in range(1, min(3, len(route) - 1 - p) + 1):
+                if neighbor_lists is None:
+                    for b, other in enumerate(routes):
+                        if b != a:
+                            for q in range(len(other) - 1):
+                                yield "relocate", a, p, length, b, q
+                    continue
+
+                for node in neighbor_lists[route[p]].tolist():
+                    if node == nest:
+                        # after or before the nest of every other route
+                        for b, other in enumerate(routes):
+                            if b != a:
+                                yield "relocate", a, p, length, b, 0
+                                yield "relocate", a, p, length, b, len(other) - 2
+                        continue
+
+                    b, j = position[node]
+                    if b != a:
+                        yield "relocate", a, p, length, b, j
+                        yield "relocate", a, p, length, b, j - 1
+
+
+def _exchange_moves(routes, position, neighbor_lists, nest):
+    """
+    Generate the ("exchange", a, p, b, q) moves: route[a][p] and route[b][q] swap their places
+    """
+    for a, route in enumerate(routes):
+        for p in range(1, len(route) - 1):
+            if neighbor_lists is None:
+                for b in range(a + 1, len(routes)):
+                    for q in range(1, len(routes[b]) - 1):
+                        yield "exchange", a, p, b, q
+                continue
+
+            for node in neighbor_lists[route[p]].tolist():
+                if node != nest:
+                    b, q = position[node]
+                    if b != a:
+                        yield "exchange", a, p, b, q
+
+
+def _two_opt_star_moves(routes, position, neighbor_lists, nest):
+    """
+    Generate the ("two_opt_star", a, p, b, q) moves: route a keeps route[a][:p + 1] followed by
+    route[b][q + 1:] and route b keeps route[b][:q + 1] followed by route[a][p + 1:]
+    """
+    for a, route in enumerate(routes):
+        for p in range(len(route) - 1):
+            if neighbor_lists is None:
+                for b in range(a + 1, len(routes)):
+                    for q in range(len(routes[b]) - 1):
+                        # swapping the whole subroutes or nothing changes nothing
+                        if (p, q) != (0, 0) and (p, q) != (len(route) - 2, len(routes[b]) - 2):
+                            yield "two_opt_star", a, p, b, q
+                continue
+
+            # new arc route[a][p] -> route[b][q + 1]
+            for node in neighbor_lists[route[p]].tolist():
+                if node != nest:
+                    b, j = position[node]
+                    if b != a:
+                        yield "two_opt_star", a, p, b, j - 1
+
+
+def _delta(move, routes, d):
+    """
+    Cost delta of a move, d is the distance matrix as nested lists
+    """
+    kind, a = move[0], move[1]
+    route = routes[a]
+
+    if kind == "relocate":
+        p, length, b, q = move[2:]
+        other = routes[b]
+        e = p + length - 1
+        before, first, last, after = route[p - 1], route[p], route[e], route[e + 1]
+
+        return (d[before][after] - d[before][first] - d[last][after] +
+                d[other[q]][first] + d[last][other[q + 1]] - d[other[q]][other[q + 1]])
+
+    p, b, q = move[2:]
+    other = routes[b]
+
+    if kind == "exchange":
+        u, v = route[p], other[q]
+        u_before, u_after, v_before, v_after = route[p - 1], route[p + 1], other[q - 1], other[q + 1]
+
+        return (d[u_before][v] + d[v][u_after] - d[u_before][u] - d[u][u_after] +
+                d[v_before][u] + d[u][v_after] - d[v_before][v] - d[v][v_after])
+
+    # two_opt_star
+    u, u_after, v, v_after = route[p], route[p + 1], other[q], other[q + 1]
+
+    return d[u][v_after] + d[v][u_after] - d[u][u_after] - d[v][v_after]
+
+
+def _fits(move, routes, data, demand, max_load):
+    """
+    Check if the subroutes changed by a move stay within the load limits
+    """
+    kind, a = move[0], move[1]
+    route = routes[a]
+    data_a = data[a]
+
+    if kind == "relocate":
+        p, length, b, q = move[2:]
+        data_b = data[b]
+        e = p + length - 1
+        loads_a, loads_b = data_a[0], data_b[0]
+        moved = loads_a[e] - loads_a[p - 1]
+
+        # loads of the moved nodes once they follow other[q]
+        start = loads_b[q] - loads_a[p - 1]
+        segment = loads_a[p:e + 1]
+
+        return (data_a[1][p - 1] and _suffix_fits(data_a, e + 1, -moved, max_load) and data_b[1][q] and
+                start + min(segment) >= 0 and start + max(segment) <= max_load and
+                _suffix_fits(data_b, q + 1, moved, max_load))
+
+    p, b, q = move[2:]
+    data_b = data[b]
+
+    if kind == "exchange":
+        u, v = route[p], routes[b][q]
+        shift = demand[v] - demand[u]
+
+        return (data_a[1][p - 1] and 0 <= data_a[0][p - 1] + demand[v] <= max_load and
+                _suffix_fits(data_a, p + 1, shift, max_load) and data_b[1][q - 1] and
+                0 <= data_b[0][q - 1] + demand[u] <= max_load and _suffix_fits(data_b, q + 1, -shift, max_load))
+
+    # two_opt_star
+    shift = data_a[0][p] - data_b[0][q]
+
+    return (data_a[1][p] and _suffix_fits(data_b, q + 1, shift, max_load) and
+            data_b[1][q] and _suffix_fits(data_a, p + 1, -shift, max_load))
+
+
+def _apply(move, routes):
+    kind, a = move[0], move[1]
+    route = routes[a]
+
+    if kind == "relocate":
+        p, length, b, q = move[2:]
+        segment = route[p:p + length]
+        del route[p:p + length]
+        routes[b][q + 1:q + 1] = segment
+    elif kind == "exchange":
+        p, b, q = move[2:]
+        route[p], routes[b][q] = routes[b][q], route[p]
+    else:
+        p, b, q = move[2:]
+        other = routes[b]
+        routes[a], routes[b] = route[:p + 1] + other[q + 1:], other[:q + 1] + route[p + 1:]
+
+    # drop the subroutes left without nodes
+    routes[:] = [route for route in routes if len(route) > 2]
+
+
+def improve_solution(routes, distance_matrix, demand, max_load, neighbor_lists=None):
+    """
+    Improve a solution moving nodes between its subroutes until no move lowers its cost
+
+    The moves are relocate (a node moves to another subroute), Or-opt (2 or 3
+    consecutive nodes move to another subroute), exchange (two nodes of different
+    subroutes swap their places) and 2-opt* (two subroutes swap their tails).
+    Each move is evaluated from the arcs it changes and from the prefix loads and
+    the suffix load ranges of the subroutes, and the best move is applied at each
+    pass. With neighbor_lists only the moves that bring a node next to one of its
+    neighbors are tried.
+    It returns the improved subroutes and the number of moves tried and applied
+    """
+    routes = [list(route) for route in routes]
+    tried = applied = 0
+
+    if len(routes) < 2:
+        return routes, tried, applied
+
+    nest = routes[0][0]
+    demand_list = np.asarray(demand).tolist()
+
+    # a move can leave a subroute with only the nest, that has to cost nothing
+    if distance_matrix[nest, nest] != 0:
+        distance_matrix = distance_matrix.copy()
+        distance_matrix[nest, nest] = 0
+
+    distances = distance_matrix.tolist()
+
+    while True:
+        data = [_route_data(route, demand, max_load) for route in routes]
+        position = {node: (r, i) for r, route in enumerate(routes) for i, node in enumerate(route[1:-1], 1)}
+
+        best_delta, best_move = -EPSILON, None
+        moves = itertools.chain(_relocate_moves(routes, position, neighbor_lists, nest),
+                                _exchange_moves(routes, position, neighbor_lists, nest),
+                                _two_opt_star_moves(routes, position, neighbor_lists, nest))
+
+        for move in moves:
+            tried += 1
+            delta = _delta(move, routes, distances)
+
+            if delta < best_delta and _fits(move, routes, data, demand_list, max_load):
+                best_delta, best_move = delta, move
+
+        if best_move is None:
+            return routes, tried, applied
+
+        _apply(best_move, routes)
+        applied += 1
@@ -0,0 +1,236 @@
+"""
+Long-running local solve service
+
+The service loads its instances once and keeps a pool of worker processes that
+have already loaded them too, with their heuristic matrices, so a request pays
+only for the solve itself. The demand of an instance can be updated without
+reloading it. At most max_pending requests are accepted at the same time, the
+others are refused until one of them is done.
+
+The service is exposed on localhost over HTTP with JSON bodies:
+  GET  /instances                    names, sizes and capacities of the instances
+  POST /instances/<name>/demand      {"demand": [...]} replaces the demand of an instance
+  POST /solve                        {"instance": name, "parameters": {...}, "options": {...}}
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Barrier, cpu_count
+from threading import Lock
+import numpy as np
+from colonyModule import heuristics, solver
+from colonyModule.dataset import load_dataset, load_datasets
+
+# Colony options a request can set
+OPTIONS = {"seed", "time_limit", "stagnation", "target_cost", "max_evaluations", "candidates", "neighbors",
+           "inter_route", "subroute_cache"}
+
+# instances loaded by a pool worker, set by _init_worker
+_datasets = None
+# barrier of the pool workers starting with the service
+_started = None
+
+
+class ServiceBusy(Exception):
+    """
+    Raised when the service already has max_pending requests
+    """
+
+
+class UnknownInstance(Exception):
+    """
+    Raised when a request names an instance the service didn't load
+    """
+
+
+def instance_name(dataset):
+    return os.path.splitext(dataset.name)[0]
+
+
+def _init_worker(files, parameters, started):
+    """
+    Load the instances in a pool worker and compute their heuristic matrices
+    """
+    global _datasets, _started
+
+    _started = started
+    _datasets = {}
+
+    for file in files:
+        dataset = load_dataset(file)
+        _datasets[instance_name(dataset)] = dataset
+
+        heuristics.default_cache.get(dataset.cost_matrix, parameters["beta"], parameters["gamma"])
+        heuristics.default_cache.neighbors(dataset.cost_matrix, 10)
+
+
+def _wait_started():
+    """
+    Wait until all the pool workers are started, so each one runs one of these tasks
+    """
+    _started.wait()
+
+
+def _solve(name, demand, parameters, options):
+    dataset = _datasets[name]._replace(demand=np.asarray(demand))
+
+    return solver.solve(dataset, parameters, backend="serial", **options)
+
+
+class SolveService:
+    """
+    Solves the requests on the preloaded instances
+
+    Parameters:
+      files: paths of the instances, each one is named after its file without the extension
+      workers: processes solving the requests, by default one for each cpu
+      max_pending: requests accepted at the same time, queued or running, by default 4 for each worker
+      parameters: default parameters of the colonies (see solver.DEFAULT_PARAMETERS)
+    """
+
+    def __init__(self, files, workers=None, max_pending=None, parameters=None):
+        self._parameters = dict(solver.DEFAULT_PARAMETERS, **(parameters or {}))
+        self._datasets = {instance_name(dataset): dataset for dataset in load_datasets(files)}
+        self._demand = {name: list(map(int, dataset.demand)) for name, dataset in self._datasets.items()}
+
+        workers = workers or cpu_count()
+        self._max_pending = max_pending or 4 * workers
+        self._pending = 0
+        self._lock = Lock()
+        started = Barrier(workers)
+        self._executor = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                             initargs=(list(files), self._parameters, started))
+
+        # the pool starts its workers on demand, start all of them now with their instances loaded
+        for future in [self._executor.submit(_wait_started) for _ in range(workers)]:
+            future.result()
+
+    def instances(self):
+        return [{"name": name, "n_nodes": dataset.n_nodes, "max_load": dataset.max_load}
+                for name, dataset in sorted(self._datasets.items())]
+
+    def _dataset(self, name):
+        if name not in self._datasets:
+            raise UnknownInstance("unknown instance " + repr(name))
+
+        return self._datasets[name]
+
+    def update_demand(self, name, demand):
+        """
+        Replace the demand of an instance for the next requests
+        """
+        dataset = self._dataset(name)
+
+        if len(demand) != dataset.n_nodes:
+            raise ValueError("expected %d demands, got %d" % (dataset.n_nodes, len(demand)))
+
+        if any(abs(int(q)) > dataset.max_load for q in demand):
+            raise ValueError("a demand exceeds the capacity " + str(dataset.max_load))
+
+        self._demand[name] = [int(q) for q in demand]
+
+    def solve(self, name, parameters=None, options=None):
+        """
+        Solve an instance with its current demand
+        It returns the solution of solver.solve with the seconds spent waiting for a worker
+        and the total seconds of the request
+        """
+        self._dataset(name)
+        options = options or {}
+
+        if not set(options) <= OPTIONS:
+            raise ValueError("unknown options " + ", ".join(sorted(set(options) - OPTIONS)))
+
+        with self._lock:
+            if self._pending >= self._max_pending:
+                raise ServiceBusy("%d requests pending" % self._pending)
+
+            self._pending += 1
+
+        start = time.time()
+
+        try:
+            solution = self._executor.submit(_solve, name, self._demand[name],
+                                             dict(self._parameters, **(parameters or {})), options).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        solution["total_time"] = time.time() - start
+        solution["queue_time"] = solution["total_time"] - solution["time"]
+
+        return solution
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP front end of the service of the server
+    """
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _handle(self, call):
+        try:
+            self._reply(200, call())
+        except UnknownInstance as e:
+            self._reply(404, {"error": str(e)})
+        except (ValueError, TypeError) as e:
+            self._reply(400, {"error": str(e)})
+        except ServiceBusy as e:
+            self._reply(503, {"error": str(e)})
+        except Exception as e:
+            self._reply(500, {"error": repr(e)})
+
+    def do_GET(self):
+        if self.path == "/instances":
+            self._handle(self.server.service.instances)
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        service = self.server.service
+        parts = self.path.strip("/").split("/")
+
+        if parts == ["solve"]:
+            def call():
+                body = self._body()
+                return service.solve(body.get("instance"), body.get("parameters"), body.get("options"))
+        elif len(parts) == 3 and parts[0] == "instances" and parts[2] == "demand":
+            def call():
+                service.update_demand(parts[1], self._body().get("demand"))
+                return {"instance": parts[1]}
+        else:
+            self._reply(404, {"error": "not found"})
+            return
+
+        self._handle(call)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host="127.0.0.1", port=8765):
+    """
+    Create the HTTP server of service, serve_forever() starts it
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.service = service
+
+    return server
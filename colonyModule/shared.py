@@ -0,0 +1,68 @@
+import numpy as np
+from multiprocessing.shared_memory import SharedMemory
+
+
+class SharedArray:
+    """
+    A NumPy array stored in a shared memory buffer
+
+    The process that creates the array owns the buffer and removes it on close,
+    the other processes attach to it through descriptor() and read it zero-copy
+
+    Attributes:
+      array: NumPy view of the buffer
+    """
+
+    def __init__(self, shape, dtype, name=None):
+        self._owner = name is None
+
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        self._shm = SharedMemory(name=name, create=self._owner, size=size if self._owner else 0)
+
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf)
+
+    @classmethod
+    def from_array(cls, array):
+        """
+        Create a shared array with a copy of array
+        """
+        array = np.asarray(array)
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+
+        return shared
+
+    @classmethod
+    def attach(cls, descriptor):
+        """
+        Attach to the shared array of another process
+        """
+        name, shape, dtype = descriptor
+
+        return cls(shape, dtype, name)
+
+    def descriptor(self):
+        """
+        What another process needs to attach to the array
+        """
+        return (self._shm.name, self.array.shape, self.array.dtype.str)
+
+    def close(self):
+        """
+        Release the buffer, it's removed if this process created it
+        """
+        if self._shm is None:
+            return
+
+        self.array = None
+
+        try:
+            self._shm.close()
+        except BufferError:
+            # someone still has a view of the buffer, it's unmapped when the view is released
+            pass
+
+        if self._owner:
+            self._shm.unlink()
+
+        self._shm = None
@@ -0,0 +1,63 @@
+"""
+Solve a dataset with a colony in a single call
+"""
+import time
+from colonyModule.Colony import Colony
+from colonyModule.Node import Node
+
+# parameters used for the results in the README
+DEFAULT_PARAMETERS = {"colony_size": 50, "alpha": 6, "beta": 5, "gamma": 5, "lam": 5,
+                      "rho": 0.4, "sigma": 1, "iterations": 100}
+
+
+def create_colony(dataset, parameters=None, state=None, **options):
+    """
+    Create a colony for a dataset (see colonyModule.dataset)
+
+    parameters overrides DEFAULT_PARAMETERS, options are the keyword arguments of Colony
+    and state is a colony state to warm start from (see colonyModule.state.load_state)
+    """
+    parameters = dict(DEFAULT_PARAMETERS, **(parameters or {}))
+    nodes = [Node(i) for i in range(dataset.n_nodes)]
+    pheromone_matrix = None
+
+    if state is not None:
+        pheromone_matrix = state["pheromone_matrix"]
+        options["initial_solution"] = state["solution"]
+
+    return Colony(nodes, dataset.demand, nodes[0], dataset.max_load, parameters["colony_size"], parameters["alpha"],
+                  parameters["beta"], parameters["gamma"], parameters["lam"], parameters["rho"], parameters["sigma"],
+                  parameters["iterations"], None, pheromone_matrix, dataset.cost_matrix, **options)
+
+
+def solve(dataset, parameters=None, best_known=None, target_gap=None, save_state=None, **options):
+    """
+    Solve a dataset and return its solution as subroutes of node ids, with its cost,
+    wall time, number of iterations and stop reason; route and cost are None if there isn't any solution
+
+    With best_known, the run stops when the gap from it is at most target_gap percent.
+    The colony state is saved to the save_state path after the run, and a state can
+    be given to warm start the run (see create_colony)
+    """
+    parameters = dict(DEFAULT_PARAMETERS, **(parameters or {}))
+
+    if target_gap is not None:
+        options["target_cost"] = best_known * (1 + target_gap / 100)
+
+    with create_colony(dataset, parameters, **options) as colony:
+        start = time.time()
+        solution = colony.foraging()
+        end = time.time()
+
+        if save_state is not None:
+            colony.save_state(save_state)
+
+    if solution is None:
+        solution = {"route": None, "cost": None, "iterations": None, "stop_reason": "no_solution"}
+    else:
+        solution["route"] = [[node.id for node in route] for route in solution["route"]]
+
+    solution["dataset"] = dataset.name
+    solution["time"] = end - start
+
+    return solution
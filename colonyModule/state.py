@@ -0,0 +1,40 @@
+"""
+Save and load the state of a colony to warm start the next run
+
+The state is a compressed .npz file with the pheromone matrix and the best
+solution, stored as its subroutes of node ids joined by their nests (as in the
+route buffers of colonyModule.worker) with its cost.
+"""
+import numpy as np
+from colonyModule import utils
+
+
+def save_state(path, pheromone_matrix, solution):
+    """
+    Write the pheromone matrix and the best solution (node ids, None if there isn't one) to path
+    """
+    if solution is None or solution["route"] is None:
+        route, cost = np.empty(0, dtype=np.int32), np.nan
+    else:
+        route = np.array(utils.join_routes(solution["route"]), dtype=np.int32)
+        cost = solution["cost"]
+
+    np.savez_compressed(path, pheromone_matrix=pheromone_matrix, route=route, cost=cost)
+
+
+def load_state(path):
+    """
+    Read a state written by save_state, it returns a dict with the pheromone matrix and the solution
+    """
+    with np.load(path) as state:
+        pheromone_matrix = state["pheromone_matrix"]
+        route = state["route"]
+        cost = float(state["cost"])
+
+    solution = None
+
+    if len(route):
+        solution = {"route": utils.split_route(route, route[0]), "cost": cost}
+
+    return {"pheromone_matrix": pheromone_matrix,
+            "solution": solution}
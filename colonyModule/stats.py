@@ -0,0 +1,112 @@
+"""
+Opt-in instrumentation of a colony run
+
+The colony and the ants record phase timers and counters only when instrumentation
+is enabled: the ants are then InstrumentedAnt objects, otherwise the plain Ant code
+runs without any check.
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from colonyModule.Ant import Ant
+
+
+class Stats:
+    """
+    Phase timers (in seconds) and counters of a run
+
+    Attributes:
+      timers: seconds spent in each phase
+      counters: number of events of each kind
+    """
+
+    def __init__(self, timers=None, counters=None):
+        self.timers = defaultdict(float, timers or {})
+        self.counters = Counter(counters or {})
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    @contextmanager
+    def timer(self, phase):
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            self.timers[phase] += perf_counter() - start
+
+    def merge(self, other):
+        """
+        Add the timers and counters of other (a Stats or the dict of as_dict)
+        """
+        if isinstance(other, dict):
+            other = Stats(other["timers"], other["counters"])
+
+        for phase, seconds in other.timers.items():
+            self.timers[phase] += seconds
+
+        self.counters.update(other.counters)
+
+    def as_dict(self):
+        return {"timers": dict(self.timers),
+                "counters": dict(self.counters)}
+
+
+class InstrumentedAnt(Ant):
+    """
+    An Ant that records in stats the time of its phases (construction,
+    inverse_optimization, two_opt) and counts ants, steps, returns to the nest,
+    probability evaluations, 2-opt moves tried and applied and subroute cache hits and misses
+    """
+
+    def __init__(self, stats, *args):
+        self._stats = stats
+        super(InstrumentedAnt, self).__init__(*args)
+
+    def run(self):
+        stats = self._stats
+        optimization = stats.timers["inverse_optimization"] + stats.timers["two_opt"]
+        start = perf_counter()
+
+        solution = super(InstrumentedAnt, self).run()
+
+        # the route optimization is timed on its own
+        optimization = stats.timers["inverse_optimization"] + stats.timers["two_opt"] - optimization
+        stats.timers["construction"] += perf_counter() - start - optimization
+        stats.count("ants")
+
+        return solution
+
+    def _return_to_nest(self):
+        self._stats.count("nest_returns")
+        super(InstrumentedAnt, self)._return_to_nest()
+
+    def _step_route(self, from_node, to_node):
+        self._stats.count("steps")
+        super(InstrumentedAnt, self)._step_route(from_node, to_node)
+
+    def _calculate_probabilities(self, nodes):
+        self._stats.count("probability_evaluations", len(nodes))
+        return super(InstrumentedAnt, self)._calculate_probabilities(nodes)
+
+    def _inverse_optimization(self):
+        with self._stats.timer("inverse_optimization"):
+            super(InstrumentedAnt, self)._inverse_optimization()
+
+    def _cached_optimization(self):
+        cost, hits, misses = super(InstrumentedAnt, self)._cached_optimization()
+
+        self._stats.count("subroute_hits", hits)
+        self._stats.count("subroute_misses", misses)
+
+        return cost, hits, misses
+
+    def _two_opt(self):
+        with self._stats.timer("two_opt"):
+            tried, applied = super(InstrumentedAnt, self)._two_opt()
+
+        self._stats.count("two_opt_tried", tried)
+        self._stats.count("two_opt_applied", applied)
+
+        return tried, applied
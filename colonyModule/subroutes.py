@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class SubrouteCache:
+    """
+    Keeps the optimized ordering and the cost of the nest to nest subroutes already seen
+
+    The route optimization of a subroute (inversion and 2-opt) depends only on the
+    subroute and the instance, so an ant can reuse the result of any other ant of the
+    colony. Entries are keyed by the tuple of node ids of the subroute.
+
+    The cache is shared by the threads of a process, a pickled cache (for example sent
+    to a pool worker) starts empty, so each worker process keeps its own entries.
+
+    Parameters:
+      maxsize: max number of subroutes kept, the least recently used one is dropped first
+    """
+
+    def __init__(self, maxsize=10000):
+        self._maxsize = maxsize
+        self._subroutes = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subroute):
+        """
+        Return the (ordering, cost) pair of subroute, None if it isn't in the cache
+        """
+        key = tuple(subroute)
+
+        with self._lock:
+            entry = self._subroutes.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._subroutes.move_to_end(key)
+            self.hits += 1
+
+            return entry
+
+    def put(self, subroute, ordering, cost):
+        with self._lock:
+            self._subroutes[tuple(subroute)] = (tuple(ordering), cost)
+
+            while len(self._subroutes) > self._maxsize:
+                self._subroutes.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._subroutes)}
+
+    def clear(self):
+        with self._lock:
+            self._subroutes.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._subroutes)
+
+    def __getstate__(self):
+        return {"maxsize": self._maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state["maxsize"])
@@ -0,0 +1,131 @@
+"""
+Tune the parameters of the colony by successive halving
+
+A set of random configurations is evaluated on the training instances, then the
+worst half is dropped and the survivors get twice the budget, until one is left.
+Each round spends the same share of the budget, measured in ants evaluated so
+that configurations with different colony sizes get the same effort. The trials
+run in a pool of processes, each one loads the instances once and keeps their
+heuristic matrices between the trials.
+"""
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from colonyModule import solver
+from colonyModule.dataset import load_dataset
+
+# values tried for each parameter
+SEARCH_SPACE = {"colony_size": [10, 20, 30, 50],
+                "alpha": [1, 2, 4, 6, 8],
+                "beta": [1, 2, 3, 5, 7],
+                "gamma": [1, 2, 3, 5, 7],
+                "lam": [1, 2, 3, 5, 7],
+                "rho": [0.1, 0.2, 0.4, 0.6],
+                "sigma": [0.5, 1, 2]}
+
+# instances loaded by a pool worker, set by _init_worker
+_datasets = None
+
+
+def _init_worker(files):
+    global _datasets
+
+    _datasets = [load_dataset(file) for file in files]
+
+
+def _run_trial(instance, parameters, max_evaluations, seed):
+    """
+    Solve an instance of the pool worker with at most max_evaluations ants, it returns the cost or None
+    """
+    # the colony stops at max_evaluations, its last iteration may be partial
+    parameters = dict(parameters, iterations=max(1, math.ceil(max_evaluations / parameters["colony_size"])))
+    solution = solver.solve(_datasets[instance], parameters, max_evaluations=max_evaluations,
+                            seed=seed, backend="serial")
+
+    return solution["cost"]
+
+
+def sample_configurations(configurations, seed=None):
+    """
+    Draw configurations from SEARCH_SPACE, the first one is solver.DEFAULT_PARAMETERS
+    """
+    rng = np.random.default_rng(seed)
+    samples = [{name: solver.DEFAULT_PARAMETERS[name] for name in SEARCH_SPACE}]
+
+    while len(samples) < configurations:
+        sample = {name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE.items()}
+
+        if sample not in samples:
+            samples.append(sample)
+
+    # numpy scalars aren't JSON serializable
+    return [{name: value.item() if hasattr(value, "item") else value for name, value in sample.items()}
+            for sample in samples]
+
+
+def tune(instances, budget, configurations=16, eta=2, seed=None, workers=None):
+    """
+    Find the configuration with the lowest mean gap on the instances
+
+    Parameters:
+      instances: list of {"file": ..., "best": ...} with the known best cost of each instance
+      budget: ants evaluated in all the trials
+      configurations: number of configurations of the first round
+      eta: only 1/eta of the configurations survive each round
+      seed: seed of the configurations and of the trials
+      workers: processes evaluating the trials, by default one for each cpu
+
+    It returns the configurations of the last round sorted by mean gap, as (parameters, gap)
+    pairs, and the history of all the rounds
+    """
+    candidates = sample_configurations(configurations, seed)
+    rounds = int(math.log(len(candidates), eta) + 1e-9) + 1
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(instances))]
+    history = []
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=([instance["file"] for instance in instances],)) as executor:
+        for _ in range(rounds):
+            max_evaluations = max(1, int(budget / rounds / (len(candidates) * len(instances))))
+
+            # every configuration sees the same seed on an instance
+            futures = [[executor.submit(_run_trial, i, dict(solver.DEFAULT_PARAMETERS, **parameters),
+                                        max_evaluations, seeds[i])
+                        for i in range(len(instances))] for parameters in candidates]
+
+            gaps = []
+
+            for parameters, trials in zip(candidates, futures):
+                costs = [trial.result() for trial in trials]
+
+                if any(cost is None for cost in costs):
+                    gaps.append(float("inf"))
+                else:
+                    gaps.append(float(np.mean([(cost / instance["best"] - 1) * 100
+                                               for cost, instance in zip(costs, instances)])))
+
+            ranking = sorted(zip(candidates, gaps), key=lambda result: result[1])
+            history.append({"max_evaluations": max_evaluations, "results": ranking})
+
+            candidates = [parameters for parameters, _ in ranking[:max(1, math.ceil(len(ranking) / eta))]]
+
+    return ranking, history
+
+
+def city(name):
+    """
+    The city of a dataset file, e.g. "bergamo" for "7Bergamo30.txt"
+    """
+    name = os.path.splitext(os.path.basename(name))[0]
+
+    return re.sub(r"\d", "", name).lower()
+
+
+def profile_parameters(profile, name):
+    """
+    Parameters of the city of a dataset in a profile written by tune.py,
+    solver.DEFAULT_PARAMETERS if the city isn't in the profile
+    """
+    return dict(solver.DEFAULT_PARAMETERS, **profile.get(city(name), {}))
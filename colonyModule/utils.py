@@ -1,60 +1,54 @@
-from math import log
-from numpy import nextafter, inf
+from numpy import nextafter, inf, errstate, fill_diagonal, argsort, arange, flatnonzero, asarray
 
 
-def calculate_tau(pheromone_matrix, current_node, node, alpha):
-    tau = pheromone_matrix[current_node.id][node.id]**alpha
-
-    if tau == 0.0:
-        tau = nextafter(0.1, inf)
-
-    return tau
-
-
-def calculate_eta(distance_matrix, current_node, node, beta):
-    return (1/distance_matrix[current_node.id][node.id]) ** beta
+def calculate_heuristic(distance_matrix, beta, gamma):
+    """
+    Calculate the static part (eta * mi) of the numerator for every pair of nodes
 
+    It depends only on the distance matrix, beta and gamma
+    """
+    with errstate(divide="ignore"):
+        eta = (1 / distance_matrix) ** beta
 
-def calculate_mi(distance_matrix, current_node, node, gamma):
-    mi = (distance_matrix[current_node.id][0] + distance_matrix[0]
-          [node.id] - distance_matrix[current_node.id][node.id]) ** gamma
+    mi = (distance_matrix[:, [0]] + distance_matrix[0] - distance_matrix) ** gamma
+    mi[mi == 0.0] = nextafter(0.1, inf)
 
-    if mi == 0.0:
-        mi = nextafter(0.1, inf)
-    return mi
+    heuristic = eta * mi
 
+    # a node can't be reached from itself
+    fill_diagonal(heuristic, 0)
 
-def calculate_k(load, demand, max_load, node, lam):
-    return ((load + abs(demand[node.id])) / max_load) ** lam
+    return heuristic
 
 
-def calculate_numerator(pheromone_matrix, distance_matrix, current_node, node, load, max_load, demand, alpha, beta, gamma, lam):
+def calculate_neighbors(distance_matrix, k):
     """
-    Calculate numerator to compute the probability of a route
+    Calculate the k nearest nodes of each node, sorted by cost
     """
-    tau = calculate_tau(pheromone_matrix, current_node, node, alpha)
-    eta = calculate_eta(distance_matrix, current_node, node, beta)
-    mi = calculate_mi(distance_matrix, current_node, node, gamma)
-    k = calculate_k(load, demand, max_load, node, lam)
+    nodes_size = len(distance_matrix)
+    order = argsort(distance_matrix, axis=1, kind="stable")
 
-    return 10**(log(tau, 10)+log(eta, 10)+log(mi, 10)+log(k, 10))
+    # a node isn't a neighbor of itself
+    order = order[order != arange(nodes_size)[:, None]].reshape(nodes_size, nodes_size - 1)
 
+    return order[:, :k]
 
-def calculate_denominator(unvisited_nodes, pheromone_matrix, distance_matrix, current_node, node, load, max_load, demand, alpha, beta, gamma, lam):
+
+def calculate_probabilities(pheromone_matrix, heuristic_matrix, current_node, nodes, load, max_load, demand, alpha, lam):
     """
-    Calculate denominator to compute the probability of a route
+    Calculate the probability of a route for every node in nodes in a single pass
+
+    current_node is a node id, nodes an array of node ids and demand an array of vertices demand,
+    the denominator is computed only once for all the nodes
     """
-    sum = 0.0
+    tau = pheromone_matrix[current_node][nodes] ** alpha
+    tau[tau == 0.0] = nextafter(0.1, inf)
 
-    for node in unvisited_nodes:
-        tau = calculate_tau(pheromone_matrix, current_node, node, alpha)
-        eta = calculate_eta(distance_matrix, current_node, node, beta)
-        mi = calculate_mi(distance_matrix, current_node, node, gamma)
-        k = calculate_k(load, demand, max_load, node, lam)
+    k = ((load + abs(demand[nodes])) / max_load) ** lam
 
-        sum += 10**(log(tau, 10) + log(eta, 10) + log(mi, 10) + log(k, 10))
+    numerators = tau * heuristic_matrix[current_node][nodes] * k
 
-    return sum
+    return calculate_probability(numerators, numerators.sum())
 
 
 def calculate_probability(numerator, denominator):
@@ -64,29 +58,24 @@ def calculate_probability(numerator, denominator):
     return numerator/denominator
 
 
-def split_route(route):
+def split_route(route, nest):
     """
-    Split a full route into single nest to nest subroute
+    Split a full route of node ids into single nest to nest subroutes
     """
-    routes = []
-    i = -1
+    route = asarray(route)
+    nests = flatnonzero(route == nest).tolist()
+    route = route.tolist()
 
-    for node in route:
-        if node.id == 0:
-            # start a new subroute in position i
-            if i != -1:
-                # close the old subroute
-                routes[i].append(route[0])
+    # the route ends in the nest, so the last nest doesn't start a new subroute
+    return [route[start:end + 1] for start, end in zip(nests, nests[1:])]
 
-            # start the new subroute
-            routes.append([node])
-            i += 1
-        else:
-            # add node to the i-subroute
-            routes[i].append(node)
 
-    # return all the subroute except for the last one, which is composed only by the nest (node 0)
-    return routes[:-1]
+def join_routes(routes):
+    """
+    Join nest to nest subroutes into a full route of node ids, the inverse of split_route
+    """
+    # the first node of a subroute is the last one of the previous subroute
+    return list(routes[0]) + [node for subroute in routes[1:] for node in subroute[1:]]
 
 
 def calculate_route_cost(cost_function, route):
@@ -101,14 +90,15 @@ def calculate_route_cost(cost_function, route):
     return cost
 
 
-def check_demand(route, demand, max_load):
+def check_demand(route, demand, max_load, load=0):
     """
-    Check if the load of the ant doesn't exceed max_load or isn't below zero
+    Check if the load of the ant doesn't exceed max_load or isn't below zero,
+    starting from the nest with load
     """
-    sum = 0
+    sum = load
 
     for node in route:
-        sum += demand[node.id]
+        sum += demand[node]
 
         if sum > max_load or sum < 0:
             return False
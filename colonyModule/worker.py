@@ -0,0 +1,103 @@
+"""
+Functions that send the ants of a colony to search food
+
+They are used by every execution backend, in the colony process or inside the
+processes of a worker pool. In a pool the pheromone, distance and heuristic
+matrices live in shared memory: a worker attaches to them once when it starts
+and reads them zero-copy, so each iteration sees the pheromone matrix as updated
+by the colony. The ants write their routes as node ids in an int32 buffer (one
+row for each ant) and their costs in a float64 buffer, nothing is pickled back
+to the colony.
+"""
+from collections import namedtuple
+import numpy as np
+from colonyModule import utils
+from colonyModule.Ant import Ant
+from colonyModule.shared import SharedArray
+from colonyModule.stats import InstrumentedAnt, Stats
+
+# everything an ant needs to search food, routes and costs are the output buffers,
+# entropy is the root of the random streams of the ants and instrument enables the stats
+Instance = namedtuple("Instance", ["nest", "nodes_size", "pheromone_matrix", "distance_matrix", "heuristic_matrix",
+                                   "neighbor_lists", "candidate_lists", "subroute_cache", "max_load", "demand", "alpha", "lam",
+                                   "entropy", "instrument", "routes", "costs"])
+
+# instance data of a pool worker, set by init_worker
+_instance = None
+# shared arrays the pool worker is attached to
+_shared = None
+
+
+def ant_rng(entropy, iteration, ant):
+    """
+    Random generator of an ant in an iteration
+    Each (iteration, ant) pair gets its own independent stream derived from entropy,
+    so a run doesn't depend on which worker runs which ant
+    """
+    return np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(iteration, ant)))
+
+
+def forage_ants(instance, iteration, first_ant, ants):
+    """
+    Send the ants from first_ant to first_ant + ants to search food and save their routes
+    With instance.instrument it returns the stats of the ants as a dict, otherwise None
+    """
+    stats = Stats() if instance.instrument else None
+
+    for i in range(first_ant, first_ant + ants):
+        args = (instance.nest, instance.nodes_size, instance.pheromone_matrix, instance.distance_matrix,
+                instance.heuristic_matrix, instance.neighbor_lists, instance.candidate_lists,
+                instance.subroute_cache, instance.max_load, instance.demand,
+                instance.alpha, instance.lam,
+                ant_rng(instance.entropy, iteration, i))
+        ant = Ant(*args) if stats is None else InstrumentedAnt(stats, *args)
+
+        save_solution(ant.run(), instance.routes[i], instance.costs, i)
+
+    return None if stats is None else stats.as_dict()
+
+
+def init_worker(instance, shared_descriptors):
+    """
+    Attach a pool worker to the shared matrices and keep the instance data for all the next iterations
+    The shared arrays replace the matrices and buffers in instance
+    """
+    global _instance, _shared
+
+    _shared = [SharedArray.attach(descriptor) for descriptor in shared_descriptors]
+    pheromone_matrix, distance_matrix, heuristic_matrix, routes, costs = [shared.array for shared in _shared]
+
+    _instance = instance._replace(pheromone_matrix=pheromone_matrix, distance_matrix=distance_matrix,
+                                  heuristic_matrix=heuristic_matrix, routes=routes, costs=costs)
+
+
+def forage(iteration, first_ant, ants):
+    """
+    Send the ants of a pool worker to search food
+    """
+    return forage_ants(_instance, iteration, first_ant, ants)
+
+
+def save_solution(solution, route_row, costs, i):
+    """
+    Write the route of a solution as node ids in route_row and its cost in costs[i]
+    The subroutes are joined by their nests and the row is padded with -1,
+    a missing solution has a nan cost
+    """
+    route_row.fill(-1)
+
+    if solution["route"] is None:
+        costs[i] = np.nan
+        return
+
+    route = utils.join_routes(solution["route"])
+    route_row[:len(route)] = route
+
+    costs[i] = solution["cost"]
+
+
+def load_solution(route_row, nest_id):
+    """
+    Split a row written by save_solution into nest to nest subroutes of node ids
+    """
+    return utils.split_route(route_row[route_row >= 0], nest_id)
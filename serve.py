@@ -0,0 +1,45 @@
+"""
+Run the local solve service
+
+Loads the instances once and serves solve requests on localhost over HTTP,
+see colonyModule.service for the API.
+
+Example:
+  python serve.py --port 8765 dataset/parma10.txt dataset/bergamo10.txt
+  curl -d '{"instance": "parma10", "options": {"time_limit": 1}}' localhost:8765/solve
+"""
+import argparse
+import os
+import sys
+from colonyModule.service import SolveService, make_server
+from example import DATASETS, OTHER_DATASETS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", help="instance files, by default the datasets of example.py found on disk")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="processes solving the requests, by default one for each cpu")
+    parser.add_argument("--max-pending", type=int, help="requests accepted at the same time, by default 4 for each worker")
+    args = parser.parse_args(argv)
+
+    files = args.files or [instance["file"] for instance in DATASETS + OTHER_DATASETS if os.path.exists(instance["file"])]
+    service = SolveService(files, args.workers, args.max_pending)
+    server = make_server(service, args.host, args.port)
+
+    print("serving %d instances on http://%s:%d" % (len(files), args.host, args.port))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import pytest
+from colonyModule import localsearch, solver
+from colonyModule.dataset import load_dataset
+
+DATASET = os.path.join(os.path.dirname(__file__), os.pardir, "dataset", "bergamo10.txt")
+PARAMETERS = {"colony_size": 5, "iterations": 4}
+BACKENDS = ["serial", "threads", "processes"]
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return load_dataset(DATASET, cache=False)
+
+
+def create_colony(dataset, backend, **options):
+    return solver.create_colony(dataset, PARAMETERS, seed=1, backend=backend, workers=2, instrument=True,
+                                asynchronous=True, **options)
+
+
+# the serial backend has one slot for the whole colony, two workers have slots of 3 and 2 ants
+@pytest.mark.parametrize("backend, slot", [("serial", 5), ("threads", 3), ("processes", 3)])
+def test_batches_fill_the_slots_up_to_the_budget(dataset, backend, slot):
+    with create_colony(dataset, backend, max_evaluations=12) as colony:
+        ants = [progress["stats"].counters["ants"] for progress in colony.forage()]
+
+    # the last batches get only the ants left in the budget
+    assert sum(ants) == 12
+    assert all(0 < batch <= slot for batch in ants)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_an_asynchronous_colony_finds_a_solution(dataset, backend):
+    with create_colony(dataset, backend) as colony:
+        solution = colony.foraging()
+
+    assert solution["stop_reason"] == "iterations"
+    assert sorted(node.id for route in solution["route"] for node in route[1:-1]) == list(range(1, dataset.n_nodes))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_stopping_early_drains_the_running_batches(dataset, backend):
+    with create_colony(dataset, backend) as colony:
+        progress = colony.forage()
+        next(progress)
+        # the other batches are still searching food, they must be done before the next run
+        progress.close()
+
+        solution = colony.foraging()
+
+    routes = [[node.id for node in route] for route in solution["route"]]
+
+    # a late ant of the first run would have overwritten the row of the best ant
+    assert solution["stop_reason"] == "iterations"
+    assert solution["cost"] == localsearch.solution_cost(routes, np.asarray(dataset.cost_matrix))
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+@pytest.mark.parametrize("parameters, max_evaluations", [({"iterations": 0}, None), ({}, 0)])
+def test_no_solution_without_ants(dataset, asynchronous, parameters, max_evaluations):
+    with solver.create_colony(dataset, dict(PARAMETERS, **parameters), seed=1, backend="serial",
+                              asynchronous=asynchronous, max_evaluations=max_evaluations) as colony:
+        assert colony.foraging() is None
@@ -0,0 +1,30 @@
+import os
+import pytest
+from colonyModule import solver
+from colonyModule.dataset import load_dataset
+
+DATASET = os.path.join(os.path.dirname(__file__), os.pardir, "dataset", "bergamo10.txt")
+PARAMETERS = {"colony_size": 8, "iterations": 5}
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return load_dataset(DATASET, cache=False)
+
+
+@pytest.mark.parametrize("options", [{}, {"max_evaluations": 13}])
+def test_a_seed_gives_the_same_solution_on_every_backend(dataset, options):
+    solutions = [solver.solve(dataset, PARAMETERS, seed=7, backend=backend, workers=3, **options)
+                 for backend in ["serial", "threads", "processes"]]
+
+    for solution in solutions[1:]:
+        assert solution["route"] == solutions[0]["route"]
+        assert solution["cost"] == solutions[0]["cost"]
+        assert solution["iterations"] == solutions[0]["iterations"]
+
+
+def test_a_seed_gives_the_same_solution_on_every_run(dataset):
+    first = solver.solve(dataset, PARAMETERS, seed=7, backend="serial")
+    second = solver.solve(dataset, PARAMETERS, seed=7, backend="serial")
+
+    assert first["route"] == second["route"]
@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pytest
+from colonyModule.dataset import load_dataset
+
+COSTS = "0 5 7\n4 0 2\n6 3 0\n"
+
+
+def write(path, text, mtime=None):
+    path.write_text(text)
+
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+    return str(path)
+
+
+def test_load_dataset(tmp_path):
+    dataset = load_dataset(write(tmp_path / "city3.txt", "3\n0 2 -2\n4\n" + COSTS))
+
+    assert dataset.name == "city3.txt"
+    assert dataset.n_nodes == 3
+    assert list(dataset.demand) == [0, 2, -2]
+    assert dataset.max_load == 4
+    assert np.array_equal(dataset.cost_matrix, [[0, 5, 7], [4, 0, 2], [6, 3, 0]])
+
+
+@pytest.mark.parametrize("text", ["", "three\n0 2 -2\n4\n", "3\n0 2 x\n4\n", "3\n0 2 -2\n",
+                                  "1\n0\n4\n", "3\n0 2\n4\n", "3\n0 2 -2\n0\n"])
+def test_load_dataset_rejects_an_invalid_header(tmp_path, text):
+    with pytest.raises(ValueError):
+        load_dataset(write(tmp_path / "city3.txt", text + COSTS))
+
+
+@pytest.mark.parametrize("costs", ["0 5 7\n4 0 2\n", "0 5 7\n4 0 2\n6 3 x\n", "0 5 7\n4 0 2\n6 3 inf\n"])
+def test_load_dataset_rejects_an_invalid_cost_matrix(tmp_path, costs):
+    with pytest.raises(ValueError):
+        load_dataset(write(tmp_path / "city3.txt", "3\n0 2 -2\n4\n" + costs), cache=False)
+
+
+def test_load_dataset_caches_the_cost_matrix(tmp_path):
+    path = write(tmp_path / "city3.txt", "3\n0 2 -2\n4\n" + COSTS)
+    load_dataset(path)
+
+    assert os.path.exists(path + ".npy")
+    assert isinstance(load_dataset(path).cost_matrix, np.memmap)
+
+
+def test_load_dataset_rebuilds_a_stale_cache(tmp_path):
+    path = write(tmp_path / "city3.txt", "3\n0 2 -2\n4\n" + COSTS, mtime=1000000000)
+    load_dataset(path)
+    os.utime(path + ".npy", (1000000000, 1000000000))
+
+    # the instance changes after its cache was written
+    write(tmp_path / "city3.txt", "3\n0 2 -2\n4\n" + COSTS.replace("5", "9"), mtime=1000000100)
+
+    assert load_dataset(path).cost_matrix[0, 1] == 9
+    assert load_dataset(path).cost_matrix[0, 1] == 9
+
+
+def test_load_dataset_ignores_a_cache_of_another_size(tmp_path):
+    path = write(tmp_path / "city3.txt", "3\n0 2 -2\n4\n" + COSTS)
+    np.save(path + ".npy", np.zeros((2, 2)))
+
+    assert np.array_equal(load_dataset(path).cost_matrix, [[0, 5, 7], [4, 0, 2], [6, 3, 0]])
+
+
+def test_load_dataset_of_the_repository():
+    path = os.path.join(os.path.dirname(__file__), os.pardir, "dataset", "bergamo10.txt")
+    dataset = load_dataset(path, cache=False)
+
+    assert dataset.cost_matrix.shape == (dataset.n_nodes, dataset.n_nodes) == (10, 10)
+    assert len(dataset.demand) == 10
+    # only the nest has a zero cost to itself
+    assert (np.diag(dataset.cost_matrix)[1:] == 1e9).all()
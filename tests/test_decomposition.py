@@ -0,0 +1,41 @@
+import os
+import numpy as np
+import pytest
+from colonyModule import decomposition
+from colonyModule.dataset import load_dataset
+
+DATASETS = [os.path.join(os.path.dirname(__file__), os.pardir, "dataset", name)
+            for name in ["bergamo10.txt", "parma10.txt", "bergamo8.txt"]]
+
+
+@pytest.mark.parametrize("path", DATASETS)
+@pytest.mark.parametrize("zones", [1, 2, 3, 4])
+def test_partition_splits_the_customers(path, zones):
+    dataset = load_dataset(path, cache=False)
+    partitions = decomposition.partition(dataset, zones)
+    customers = np.concatenate(partitions)
+
+    assert len(partitions) == zones
+    assert all(len(zone) for zone in partitions)
+    assert sorted(customers.tolist()) == list(range(1, dataset.n_nodes))
+
+
+def test_partition_keeps_each_medoid_in_its_zone():
+    dataset = load_dataset(DATASETS[0], cache=False)
+    cost_matrix = np.array(dataset.cost_matrix)
+    np.fill_diagonal(cost_matrix, 0)
+    medoids = decomposition._medoids(cost_matrix, np.arange(1, dataset.n_nodes), 3)
+
+    assert len(set(medoids)) == 3
+    assert sorted(len([medoid for medoid in medoids if medoid in zone])
+                  for zone in decomposition.partition(dataset, 3)) == [1, 1, 1]
+
+
+def test_solve_decomposed():
+    dataset = load_dataset(DATASETS[0], cache=False)
+    solution = decomposition.solve_decomposed(dataset, zones=3, parameters={"colony_size": 5, "iterations": 5},
+                                              workers=2, seed=1)
+
+    assert len(solution["zone_costs"]) == 3
+    assert sorted(node for route in solution["route"] for node in route[1:-1]) == list(range(1, dataset.n_nodes))
+    assert solution["cost"] <= solution["stitched_cost"]
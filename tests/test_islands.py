@@ -0,0 +1,38 @@
+import multiprocessing
+import os
+import pytest
+from colonyModule.dataset import load_dataset
+from colonyModule.islands import run_islands
+
+DATASET = os.path.join(os.path.dirname(__file__), os.pardir, "dataset", "bergamo10.txt")
+PARAMETERS = {"colony_size": 5, "iterations": 6}
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return load_dataset(DATASET, cache=False)
+
+
+def test_run_islands(dataset):
+    solution = run_islands(dataset, islands=3, parameters=PARAMETERS, migration_interval=2, blend=0.5, seed=1)
+
+    assert solution["cost"] == min(solution["island_costs"])
+    assert solution["iterations"] == [6, 6, 6]
+    assert sorted(node for route in solution["route"] for node in route[1:-1]) == list(range(1, dataset.n_nodes))
+
+
+def test_run_islands_is_reproducible(dataset):
+    first = run_islands(dataset, islands=2, parameters=PARAMETERS, migration_interval=2, seed=1)
+    second = run_islands(dataset, islands=2, parameters=PARAMETERS, migration_interval=2, seed=1)
+
+    assert first["route"] == second["route"]
+
+
+def test_run_islands_stops_every_island_on_error(dataset):
+    # the first island fails at its first pheromone update while the others are still running
+    parameters = [dict(PARAMETERS, rho="x"), dict(PARAMETERS, iterations=100000), dict(PARAMETERS, iterations=100000)]
+
+    with pytest.raises(TypeError):
+        run_islands(dataset, parameters=parameters, migration_interval=10000, seed=1)
+
+    assert not multiprocessing.active_children()
@@ -0,0 +1,133 @@
+import itertools
+import os
+import numpy as np
+import pytest
+from colonyModule import localsearch, utils
+from colonyModule.dataset import load_dataset
+
+MAX_LOAD = 10
+# the instances of the repository cost 1e9 from a station to itself
+DATASET = os.path.join(os.path.dirname(__file__), os.pardir, "dataset", "bergamo10.txt")
+
+
+def random_instance(seed, n_nodes=30, routes=4, distance_matrix=None):
+    """
+    An asymmetric cost matrix, random unless given, and feasible subroutes whose demand
+    is drawn along each subroute
+    """
+    rng = np.random.default_rng(seed)
+
+    if distance_matrix is None:
+        distance_matrix = rng.integers(1, 1000, (n_nodes, n_nodes)).astype(float)
+        np.fill_diagonal(distance_matrix, 0)
+
+    n_nodes = len(distance_matrix)
+    demand = np.zeros(n_nodes, dtype=int)
+    customers = rng.permutation(np.arange(1, n_nodes))
+    solution = []
+
+    for part in np.array_split(customers, routes):
+        load = 0
+
+        for node in part:
+            demand[node] = rng.integers(-load, MAX_LOAD - load + 1)
+            load += demand[node]
+
+        solution.append([0] + part.tolist() + [0])
+
+    return distance_matrix, demand, solution
+
+
+def instances():
+    """
+    Random instances and instances on the cost matrix of a dataset of the repository
+    """
+    cost_matrix = np.asarray(load_dataset(DATASET, cache=False).cost_matrix)
+
+    return ([random_instance(seed) for seed in range(5)] +
+            [random_instance(seed, routes=2, distance_matrix=cost_matrix) for seed in range(5)])
+
+
+def route_cost(route, distance_matrix):
+    return localsearch.solution_cost([route], distance_matrix)
+
+
+@pytest.mark.parametrize("instance", instances())
+@pytest.mark.parametrize("neighbors", [None, 5])
+def test_two_opt_keeps_routes_feasible(instance, neighbors):
+    distance_matrix, demand, solution = instance
+    neighbor_lists = None if neighbors is None else utils.calculate_neighbors(distance_matrix, neighbors)
+
+    for route in solution:
+        improved, _, _ = localsearch.two_opt(route, distance_matrix, demand, MAX_LOAD, neighbor_lists)
+
+        assert improved[0] == improved[-1] == 0
+        assert sorted(improved) == sorted(route)
+        assert utils.check_demand(improved, demand, MAX_LOAD)
+        assert route_cost(improved, distance_matrix) <= route_cost(route, distance_matrix)
+
+
+@pytest.mark.parametrize("instance", instances())
+def test_two_opt_reaches_a_local_optimum(instance):
+    # if the deltas of the moves were wrong, some feasible reversal would still improve the route
+    distance_matrix, demand, solution = instance
+
+    for route in solution:
+        improved, _, _ = localsearch.two_opt(route, distance_matrix, demand, MAX_LOAD)
+        cost = route_cost(improved, distance_matrix)
+
+        for i, j in itertools.combinations(range(1, len(improved) - 1), 2):
+            moved = improved[:i] + improved[i:j + 1][::-1] + improved[j + 1:]
+
+            if utils.check_demand(moved, demand, MAX_LOAD):
+                assert route_cost(moved, distance_matrix) >= cost - localsearch.EPSILON
+
+
+@pytest.mark.parametrize("instance", instances())
+@pytest.mark.parametrize("neighbors", [None, 5])
+def test_improve_solution_keeps_solutions_feasible(instance, neighbors):
+    distance_matrix, demand, solution = instance
+    neighbor_lists = None if neighbors is None else utils.calculate_neighbors(distance_matrix, neighbors)
+
+    improved, _, _ = localsearch.improve_solution(solution, distance_matrix, demand, MAX_LOAD, neighbor_lists)
+
+    assert sorted(node for route in improved for node in route[1:-1]) == list(range(1, len(demand)))
+    assert all(route[0] == route[-1] == 0 and utils.check_demand(route, demand, MAX_LOAD) for route in improved)
+    assert localsearch.solution_cost(improved, distance_matrix) <= localsearch.solution_cost(solution, distance_matrix)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_improve_solution_improves_random_solutions(seed):
+    distance_matrix, demand, solution = random_instance(seed)
+
+    improved, _, applied = localsearch.improve_solution(solution, distance_matrix, demand, MAX_LOAD)
+
+    assert applied > 0
+    assert localsearch.solution_cost(improved, distance_matrix) < localsearch.solution_cost(solution, distance_matrix)
+
+
+@pytest.mark.parametrize("instance", instances())
+def test_improve_solution_deltas_match_the_costs(instance):
+    distance_matrix, demand, solution = instance
+    # as in improve_solution, a subroute left with only the nest costs nothing
+    distance_matrix = distance_matrix.copy()
+    distance_matrix[0, 0] = 0
+
+    distances = distance_matrix.tolist()
+    data = [localsearch._route_data(route, demand, MAX_LOAD) for route in solution]
+    position = {node: (r, i) for r, route in enumerate(solution) for i, node in enumerate(route[1:-1], 1)}
+    cost = localsearch.solution_cost(solution, distance_matrix)
+    moves = list(itertools.chain(localsearch._relocate_moves(solution, position, None, 0),
+                                 localsearch._exchange_moves(solution, position, None, 0),
+                                 localsearch._two_opt_star_moves(solution, position, None, 0)))
+
+    assert {move[0] for move in moves} == {"relocate", "exchange", "two_opt_star"}
+
+    for move in moves:
+        routes = [list(route) for route in solution]
+        localsearch._apply(move, routes)
+
+        assert localsearch._delta(move, solution, distances) == pytest.approx(
+            localsearch.solution_cost(routes, distance_matrix) - cost)
+        assert localsearch._fits(move, solution, data, demand.tolist(), MAX_LOAD) == \
+            all(utils.check_demand(route, demand, MAX_LOAD) for route in routes)
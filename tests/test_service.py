@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from colonyModule.service import SolveService, make_server
+
+DATASETS = [os.path.join(os.path.dirname(__file__), os.pardir, "dataset", name)
+            for name in ["bergamo10.txt", "parma10.txt"]]
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = SolveService(DATASETS, workers=1, max_pending=1, parameters={"colony_size": 5, "iterations": 5})
+    yield service
+    service.close()
+
+
+@pytest.fixture(scope="module")
+def url(service):
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://%s:%d" % server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def request(url, path, body=None):
+    """
+    The status and the JSON reply of a GET, or of a POST with body
+    """
+    data = None if body is None else json.dumps(body).encode()
+
+    try:
+        with urllib.request.urlopen(url + path, data) as reply:
+            return reply.status, json.loads(reply.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_instances(url):
+    status, instances = request(url, "/instances")
+
+    assert status == 200
+    assert [instance["name"] for instance in instances] == ["bergamo10", "parma10"]
+
+
+def test_solve(url):
+    status, solution = request(url, "/solve", {"instance": "bergamo10", "options": {"seed": 1}})
+
+    assert status == 200
+    assert solution["cost"] > 0
+    assert solution["total_time"] >= solution["time"]
+
+
+def test_update_demand(url, service):
+    demand = [0, 4, -1, 1, 1, -3, -4, -3, 1, 4]
+    status, _ = request(url, "/instances/parma10/demand", {"demand": demand})
+
+    assert status == 200
+    assert service._demand["parma10"] == demand
+
+
+@pytest.mark.parametrize("path, body", [("/solve", {"instance": "milano10"}),
+                                        ("/instances/milano10/demand", {"demand": [0]}),
+                                        ("/unknown", {}),
+                                        ("/unknown", None)])
+def test_unknown_instances_and_paths_are_not_found(url, path, body):
+    assert request(url, path, body)[0] == 404
+
+
+@pytest.mark.parametrize("path, body", [("/solve", {"instance": "bergamo10", "options": {"workers": 2}}),
+                                        ("/instances/bergamo10/demand", {"demand": [0, 1]}),
+                                        ("/instances/bergamo10/demand", {"demand": [100] * 10}),
+                                        ("/instances/bergamo10/demand", {"demand": None})])
+def test_invalid_requests_are_bad_requests(url, path, body):
+    assert request(url, path, body)[0] == 400
+
+
+def test_a_busy_service_refuses_requests(url, service):
+    running = threading.Thread(target=service.solve, args=("bergamo10", {"iterations": 100000}, {"time_limit": 2}))
+    running.start()
+
+    while service._pending == 0:
+        time.sleep(0.01)
+
+    assert request(url, "/solve", {"instance": "bergamo10"})[0] == 503
+
+    running.join()
+
+    assert request(url, "/solve", {"instance": "bergamo10"})[0] == 200
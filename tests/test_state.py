@@ -0,0 +1,48 @@
+import os
+import numpy as np
+from colonyModule import solver
+from colonyModule.dataset import load_dataset
+from colonyModule.state import load_state, save_state
+
+DATASET = os.path.join(os.path.dirname(__file__), os.pardir, "dataset", "bergamo10.txt")
+PARAMETERS = {"colony_size": 8, "iterations": 5}
+
+
+def test_save_state_round_trips(tmp_path):
+    path = str(tmp_path / "state.npz")
+    pheromone_matrix = np.random.default_rng(0).random((5, 5))
+    solution = {"route": [[0, 3, 1, 0], [0, 2, 0], [0, 4, 0]], "cost": 1234.5}
+
+    save_state(path, pheromone_matrix, solution)
+    state = load_state(path)
+
+    assert np.array_equal(state["pheromone_matrix"], pheromone_matrix)
+    assert state["solution"] == solution
+
+
+def test_save_state_without_a_solution(tmp_path):
+    path = str(tmp_path / "state.npz")
+    save_state(path, np.ones((3, 3)), None)
+
+    assert load_state(path)["solution"] is None
+
+
+def test_a_colony_warm_starts_from_its_state(tmp_path):
+    path = str(tmp_path / "state.npz")
+    dataset = load_dataset(DATASET, cache=False)
+
+    with solver.create_colony(dataset, PARAMETERS, seed=1, backend="serial") as colony:
+        solution = colony.foraging()
+        colony.save_state(path)
+        pheromone_matrix = colony.pheromone_matrix.copy()
+
+    state = load_state(path)
+
+    assert np.array_equal(state["pheromone_matrix"], pheromone_matrix)
+    assert state["solution"]["route"] == [[node.id for node in route] for route in solution["route"]]
+    assert state["solution"]["cost"] == solution["cost"]
+
+    # the warm started colony never returns a worse solution than its state
+    warm = solver.solve(dataset, dict(PARAMETERS, iterations=1), state=state, seed=2, backend="serial")
+
+    assert warm["cost"] <= solution["cost"]
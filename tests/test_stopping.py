@@ -0,0 +1,69 @@
+import os
+import pytest
+from colonyModule import solver
+from colonyModule.dataset import load_dataset
+
+DATASET = os.path.join(os.path.dirname(__file__), os.pardir, "dataset", "bergamo10.txt")
+PARAMETERS = {"colony_size": 5, "iterations": 4}
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return load_dataset(DATASET, cache=False)
+
+
+def forage(dataset, parameters=None, **options):
+    """
+    The solution of an instrumented colony and the number of ants it evaluated
+    """
+    with solver.create_colony(dataset, dict(PARAMETERS, **(parameters or {})), seed=1, instrument=True,
+                              **dict({"backend": "serial"}, **options)) as colony:
+        solution = colony.foraging()
+
+        return solution, colony.stats.counters["ants"]
+
+
+def test_stop_after_the_iterations(dataset):
+    solution, ants = forage(dataset)
+
+    assert solution["stop_reason"] == "iterations"
+    assert solution["iterations"] == 4
+    assert ants == 20
+
+
+@pytest.mark.parametrize("backend", ["serial", "threads", "processes"])
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_stop_after_max_evaluations(dataset, backend, asynchronous):
+    solution, ants = forage(dataset, max_evaluations=13, backend=backend, workers=2, asynchronous=asynchronous)
+
+    assert solution["stop_reason"] == "max_evaluations"
+    assert ants == 13
+
+
+def test_iterations_before_max_evaluations(dataset):
+    solution, ants = forage(dataset, max_evaluations=100)
+
+    assert solution["stop_reason"] == "iterations"
+    assert ants == 20
+
+
+def test_stop_at_the_target_cost(dataset):
+    solution, ants = forage(dataset, target_cost=float("inf"))
+
+    assert solution["stop_reason"] == "target"
+    assert solution["iterations"] == 1
+
+
+def test_stop_on_stagnation(dataset):
+    solution, _ = forage(dataset, {"iterations": 1000}, stagnation=2)
+
+    assert solution["stop_reason"] == "stagnation"
+    assert solution["iterations"] < 1000
+
+
+def test_the_first_iteration_runs_within_any_time_limit(dataset):
+    solution, ants = forage(dataset, time_limit=0)
+
+    assert solution["stop_reason"] == "time_limit"
+    assert solution["iterations"] == 1
+    assert ants == 5
@@ -0,0 +1,60 @@
+import os
+import pickle
+import pytest
+from colonyModule import solver
+from colonyModule.dataset import load_dataset
+from colonyModule.subroutes import SubrouteCache
+
+DATASET = os.path.join(os.path.dirname(__file__), os.pardir, "dataset", "bergamo10.txt")
+PARAMETERS = {"colony_size": 10, "iterations": 10}
+
+
+def test_get_and_put():
+    cache = SubrouteCache()
+
+    assert cache.get([0, 1, 2, 0]) is None
+
+    cache.put([0, 1, 2, 0], [0, 2, 1, 0], 10.0)
+
+    assert cache.get([0, 1, 2, 0]) == ((0, 2, 1, 0), 10.0)
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_the_least_recently_used_subroute_is_dropped_first():
+    cache = SubrouteCache(maxsize=2)
+    cache.put([0, 1, 0], [0, 1, 0], 1.0)
+    cache.put([0, 2, 0], [0, 2, 0], 2.0)
+    cache.get([0, 1, 0])
+    cache.put([0, 3, 0], [0, 3, 0], 3.0)
+
+    assert len(cache) == 2
+    assert cache.get([0, 2, 0]) is None
+    assert cache.get([0, 1, 0]) is not None
+    assert cache.get([0, 3, 0]) is not None
+
+
+def test_a_pickled_cache_starts_empty():
+    cache = SubrouteCache(maxsize=5)
+    cache.put([0, 1, 0], [0, 1, 0], 1.0)
+    cache.get([0, 1, 0])
+
+    copy = pickle.loads(pickle.dumps(cache))
+
+    assert len(copy) == 0
+    assert copy.stats() == {"hits": 0, "misses": 0, "size": 0}
+    assert copy._maxsize == 5
+
+
+@pytest.mark.parametrize("backend", ["serial", "threads", "processes"])
+def test_the_ants_reuse_the_subroutes_without_changing_the_solution(backend):
+    dataset = load_dataset(DATASET, cache=False)
+    uncached = solver.solve(dataset, PARAMETERS, seed=1, backend=backend, workers=2, subroute_cache=None)
+
+    with solver.create_colony(dataset, PARAMETERS, seed=1, backend=backend, workers=2, instrument=True,
+                              subroute_cache=1000) as colony:
+        cached = colony.foraging()
+        hits = colony.stats.counters["subroute_hits"]
+
+    assert hits > 0
+    assert [[node.id for node in route] for route in cached["route"]] == uncached["route"]
+    assert cached["cost"] == uncached["cost"]
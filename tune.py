@@ -0,0 +1,56 @@
+"""
+Tune the colony parameters for each city
+
+Groups the instances by city, tunes each city by successive halving and writes
+the best parameters of each city to a JSON profile, to be used with
+colonyModule.tuning.profile_parameters.
+
+Example:
+  python tune.py --budget 200000 --profile profile.json
+"""
+import argparse
+import json
+import os
+import sys
+from colonyModule import tuning
+from example import DATASETS, OTHER_DATASETS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--instances", help="JSON list of {\"file\": ..., \"best\": ...}, by default the datasets of example.py found on disk")
+    parser.add_argument("--budget", type=int, default=200000, help="ants evaluated for each city")
+    parser.add_argument("--configurations", type=int, default=16, help="configurations of the first round")
+    parser.add_argument("--eta", type=int, default=2, help="only 1/eta of the configurations survive each round")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, help="trials run at the same time, by default one for each cpu")
+    parser.add_argument("--profile", default="profile.json", help="JSON file of the parameters of each city")
+    args = parser.parse_args(argv)
+
+    if args.instances:
+        with open(args.instances) as f:
+            instances = json.load(f)
+    else:
+        instances = [instance for instance in DATASETS + OTHER_DATASETS if os.path.exists(instance["file"])]
+
+    cities = {}
+    for instance in instances:
+        cities.setdefault(tuning.city(instance["file"]), []).append(instance)
+
+    profile = {}
+
+    for city, city_instances in sorted(cities.items()):
+        ranking, _ = tuning.tune(city_instances, args.budget, args.configurations, args.eta, args.seed, args.jobs)
+        parameters, gap = ranking[0]
+        profile[city] = parameters
+
+        print("%-14s mean gap %6.2f%% %s" % (city, gap, parameters))
+
+    with open(args.profile, "w") as f:
+        json.dump(profile, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())